@@ -6,6 +6,9 @@
 """
 import random
 import math
+import bisect
+import itertools
+import numpy as np
 
 def index_of(a, list):
     for i in range(0, len(list)):
@@ -32,6 +35,10 @@ def sort_distance(non_dom_sol, c_distance):
         c_distance[index_of(min(c_distance), c_distance)] = math.inf
     return sorted_distance
 
+#p dominates q (minimisation), p & q are the obj values of 2 sol
+def dominates(p, q):
+    return all(a <= b for a, b in zip(p, q)) and any(a < b for a, b in zip(p, q))
+
 def fast_non_dominated_sort(values1, values2):
     S = [[] for i in range(0, len(values1))]
     front = [[]]
@@ -78,14 +85,10 @@ def fast_non_dominated_sort_3D(f1, f2, f3):
         S[p] = []
         n[p] = 0
         for q in range(0, len(f1)):
-            if (f1[p] < f1[q] and f2[p] < f2[q] and f3[p] < f3[q]) or (f1[p] <= f1[q] and f2[p] < f2[q] and f3[p] < f3[q]) or (f1[p] < f1[q] and f2[p] <= f2[q] and f3[p] < f3[q]) \
-                    or (f1[p] < f1[q] and f2[p] < f2[q] and f3[p] <= f3[q]) or (f1[p] <= f1[q] and f2[p] <= f2[q] and f3[p] < f3[q]) \
-                    or (f1[p] <= f1[q] and f2[p] < f2[q] and f3[p] <= f3[q]) or (f1[p] < f1[q] and f2[p] <= f2[q] and f3[p] <= f3[q]):
+            if dominates((f1[p], f2[p], f3[p]), (f1[q], f2[q], f3[q])):
                 if q not in S[p]:
                     S[p].append(q)
-            elif (f1[q] < f1[p] and f2[q] < f2[p] and f3[q] < f3[p]) or (f1[q] <= f1[p] and f2[q] < f2[p] and f3[q] < f3[p]) or (f1[q] < f1[p] and f2[q] <= f2[p] and f3[q] < f3[p]) \
-                    or (f1[q] < f1[p] and f2[q] < f2[p] and f3[q] <= f3[p]) or (f1[q] <= f1[p] and f2[q] <= f2[p] and f3[q] < f3[p]) \
-                    or (f1[q] <= f1[p] and f2[q] < f2[p] and f3[q] <= f3[p]) or (f1[q] < f1[p] and f2[q] <= f2[p] and f3[q] <= f3[p]):
+            elif dominates((f1[q], f2[q], f3[q]), (f1[p], f2[p], f3[p])):
                 n[p] = n[p] + 1
         if n[p] == 0:
             rank[p] = 0
@@ -148,7 +151,7 @@ def crowding_distance_3D(f1, f2, f3, front):
     for k in range(1, len(front) - 1):
         distance[sorted2[k]] = distance[sorted2[k]] + (f2[sorted2[k + 1]] - f2[sorted2[k - 1]]) / (max(f2) - min(f2) + 0.001) + 0.001
     for k in range(1, len(front) - 1):
-        distance[sorted3[k]] = distance[sorted3[k]] + (f3[sorted2[k + 1]] - f3[sorted2[k - 1]]) / (max(f3) - min(f3) + 0.001) + 0.001
+        distance[sorted3[k]] = distance[sorted3[k]] + (f3[sorted3[k + 1]] - f3[sorted3[k - 1]]) / (max(f3) - min(f3) + 0.001) + 0.001
 
     for j in distance:
         if j == 0:
@@ -258,13 +261,9 @@ def binary_tournament(index1, index2, f1_values, f2_values):
             return index2
 
 def binary_tournament_3D(p1, p2, f1, f2, f3):
-    if (f1[p1] < f1[p2] and f2[p1] < f2[p2] and f3[p1] < f3[p2]) or (f1[p1] <= f1[p2] and f2[p1] < f2[p2] and f3[p1] < f3[p2]) or (f1[p1] < f1[p2] and f2[p1] <= f2[p2] and f3[p1] < f3[p2]) \
-            or (f1[p1] < f1[p2] and f2[p1] < f2[p2] and f3[p1] <= f3[p2]) or (f1[p1] <= f1[p2] and f2[p1] <= f2[p2] and f3[p1] < f3[p2]) \
-            or (f1[p1] <= f1[p2] and f2[p1] < f2[p2] and f3[p1] <= f3[p2]) or (f1[p1] < f1[p2] and f2[p1] <= f2[p2] and f3[p1] <= f3[p2]):
+    if dominates((f1[p1], f2[p1], f3[p1]), (f1[p2], f2[p2], f3[p2])):
         return p1
-    elif (f1[p1] > f1[p2] and f2[p1] > f2[p2] and f3[p1] > f3[p2]) or (f1[p1] >= f1[p2] and f2[p1] > f2[p2] and f3[p1] > f3[p2]) or (f1[p1] > f1[p2] and f2[p1] >= f2[p2] and f3[p1] > f3[p2]) \
-            or (f1[p1] > f1[p2] and f2[p1] > f2[p2] and f3[p1] >= f3[p2]) or (f1[p1] >= f1[p2] and f2[p1] >= f2[p2] and f3[p1] > f3[p2]) \
-            or (f1[p1] >= f1[p2] and f2[p1] > f2[p2] and f3[p1] >= f3[p2]) or f1[p1] > f1[p2] and f2[p1] >= f2[p2] and f3[p1] >= f3[p2]:
+    elif dominates((f1[p2], f2[p2], f3[p2]), (f1[p1], f2[p1], f3[p1])):
         return p2
     else:
         r = random.random()
@@ -286,4 +285,124 @@ def check_bounds(x):
         else:
             offspring[i] = x[i]
 
-    return offspring
\ No newline at end of file
+    return offspring
+
+#binary tournament on the non-dominated rank, for any number of obj
+def binary_tournament_rank(index1, index2, rank):
+    if rank[index1] < rank[index2]:
+        return index1
+    elif rank[index2] < rank[index1]:
+        return index2
+    else:
+        r = random.random()
+        if r < 0.5:
+            return index1
+        else:
+            return index2
+
+#dominance matrix of obj values F (pop size by num of obj), dom[p, q] is True if p dominates q
+def dominance_matrix(F, G=None):
+    F = np.asarray(F, dtype=float)
+    G = F if G is None else np.asarray(G, dtype=float)
+    le = np.all(F[:, None, :] <= G[None, :, :], axis=2)
+    lt = np.any(F[:, None, :] < G[None, :, :], axis=2)
+
+    return le & lt
+
+#static penalty of obj values F by the constraint violation of constraint values G (<= 0 is feasible)
+#for the selection operators that ignore constraints, weight makes an infeasible sol worse than any feasible one
+#F & G are one sol (n_obj, n_constr) or a batch (n by n_obj, n by n_constr), each sol is penalised by its own violation
+def constraint_penalty(F, G, weight=1e3):
+    F, G = np.asarray(F, dtype=float), np.asarray(G, dtype=float)
+    if G.size == 0: return F
+    cv = np.maximum(G, 0).sum(axis=-1, keepdims=True)
+
+    return F + np.where(cv > 0, weight * (1 + cv), 0)
+
+#vectorised non-dominated rank (0: first front) of obj values F, pop size by num of obj
+def non_dominated_rank(F):
+    return rank_from_dominance(dominance_matrix(F))
+
+#non-dominated rank from a dominance matrix, peeling one front at a time
+def rank_from_dominance(dom):
+    n = dom.sum(axis=0) #num of sol dominating q
+    rank = np.full(dom.shape[0], -1)
+    front, i = np.flatnonzero(n == 0), 0
+    while front.size > 0:
+        rank[front] = i
+        n = n - dom[front].sum(axis=0)
+        n[rank >= 0] = -1
+        front, i = np.flatnonzero(n == 0), i + 1
+
+    return rank
+
+#Das & Dennis reference directions on the unit simplex, nObj obj & n_partitions divisions per obj
+def reference_directions(nObj, n_partitions):
+    #stars & bars, each combination of bar positions is one direction
+    bars = np.array(list(itertools.combinations(range(n_partitions + nObj - 1), nObj - 1))).reshape(-1, nObj - 1)
+    bounds = np.hstack([np.full((bars.shape[0], 1), -1), bars, np.full((bars.shape[0], 1), n_partitions + nObj - 1)])
+
+    return (np.diff(bounds, axis=1) - 1) / n_partitions
+
+#largest num of divisions with at most max_dir reference directions
+def num_partitions(nObj, max_dir):
+    p = 1
+    while math.comb(p + nObj, nObj - 1) <= max_dir:
+        p += 1
+
+    return p
+
+#reference direction based environmental selection (NSGA-III), returns the index of the n_select sol kept
+def reference_direction_selection(F, n_select, ref_dirs, rank=None):
+    F = np.asarray(F, dtype=float)
+    if rank is None: rank = non_dominated_rank(F)
+    #whole fronts that fit & the last front to be split
+    count = np.bincount(rank)
+    last = np.searchsorted(np.cumsum(count), n_select, side="right")
+    selected = np.flatnonzero(rank < last)
+    if selected.size == n_select: return selected
+    cand = np.flatnonzero(rank <= last)
+
+    #normalise with the ideal point & the nadir of the first front
+    ideal = F[cand].min(axis=0)
+    nadir = F[rank == 0].max(axis=0)
+    span = nadir - ideal
+    span[span <= 1e-10] = (F[cand].max(axis=0) - ideal)[span <= 1e-10]
+    span[span <= 1e-10] = 1
+    N = (F[cand] - ideal) / span
+
+    #associate each sol with its closest reference direction (perpendicular distance)
+    unit = ref_dirs / np.linalg.norm(ref_dirs, axis=1, keepdims=True)
+    proj = N @ unit.T
+    dist = np.sqrt(np.maximum(np.sum(N**2, axis=1, keepdims=True) - proj**2, 0))
+    niche = np.argmin(dist, axis=1)
+    niche_dist = dist[np.arange(cand.size), niche]
+
+    #niche count from the whole fronts, fill the remaining slots from the last front
+    in_last = rank[cand] == last
+    niche_count = np.bincount(niche[~in_last], minlength=ref_dirs.shape[0])
+    #last front members bucketed by niche (in index order) & active niches bucketed by niche count (sorted)
+    #so that each niching step only touches the picked niche, near-linear in the pop size
+    buckets = [[] for _ in range(ref_dirs.shape[0])]
+    for k in np.flatnonzero(in_last): buckets[niche[k]].append(k)
+    by_count = {}
+    for j in range(ref_dirs.shape[0]): by_count.setdefault(int(niche_count[j]), []).append(j)
+    level = min(by_count)
+    chosen = []
+    while len(chosen) < n_select - selected.size:
+        while len(by_count.get(level, [])) == 0: level += 1
+        j_min = by_count[level] #active niches with the min niche count
+        idx = random.randrange(len(j_min))
+        j = j_min[idx]
+        members = buckets[j]
+        if len(members) == 0:
+            del j_min[idx] #no member left, the niche is no longer considered
+            continue
+        if niche_count[j] == 0: m = min(range(len(members)), key=lambda t: niche_dist[members[t]])
+        else: m = random.randrange(len(members))
+        chosen.append(members.pop(m))
+        del j_min[idx]
+        niche_count[j] += 1
+        bisect.insort(by_count.setdefault(level + 1, []), j)
+
+    return np.concatenate([selected, cand[chosen]])
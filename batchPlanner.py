@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Batch planning over many demand scenarios/ network configurations
+- saveScenarioBank, stacks a list of param dict into a columnar npz file (scenario bank)
+- loadScenarioBank & getScenario, reads the scenario bank and rebuilds the param dict of scenario s
+- planBatch, runs orderPlanner.plan on every scenario with one shared worker pool and streams
+  the results into memory-mapped npy files as each scenario finishes
+
+Scenario bank format (npz):
+- nF, nC, nP: network size, shared by all scenarios in the bank
+- tLT (S x nF x nC), maxHr (S x nF), pRate (S x nP x nF), aveD (S x nP x nC), devD (S x nP x nC)
+  an array without the leading S axis is shared by all scenarios
+
+Output files in outDir (one row per scenario, padded with nan up to maxSol solutions):
+- sol.npy (S x maxSol x solDim), scPerf.npy (S x maxSol x 2), factPerf.npy (S x maxSol x 2*nF, nan if not required)
+- unutilCapPref.npy (S x maxSol), perfCat.npy (S x maxSol)
+- nSol.npy (S), number of Pareto solutions of each scenario, -1 if the scenario has not finished or failed
+A scenario that raises is reported & left at -1 (retried on resume), the rest of the sweep continues
+@author: cstan
+"""
+
+import os
+import traceback
+import multiprocessing as mp
+import numpy as np
+
+import orderPlanner
+
+PARAM_KEYS = ["tLT", "maxHr", "pRate", "aveD", "devD"]
+PARAM_NDIM = {"tLT": 2, "maxHr": 1, "pRate": 2, "aveD": 2, "devD": 2} #ndim of a single scenario
+OUT_KEYS = ["sol", "scPerf", "factPerf", "unutilCapPref", "perfCat"]
+
+#stack the param dict of each scenario into a columnar file
+def saveScenarioBank(path, params):
+    bank = {k: np.array(params[0][k]) for k in ["nF", "nC", "nP"]}
+    for p in params:
+        if any(p[k] != bank[k] for k in ["nF", "nC", "nP"]):
+            raise ValueError("all scenarios in a bank must share the same nF, nC & nP")
+    for k in PARAM_KEYS:
+        bank[k] = np.stack([np.asarray(p[k], dtype=float) for p in params])
+    np.savez(path, **bank)
+
+def loadScenarioBank(path):
+    with np.load(path) as f:
+        bank = {k: f[k] for k in f.files}
+    sizes = [bank[k].shape[0] for k in PARAM_KEYS if bank[k].ndim > PARAM_NDIM[k]]
+    if len(set(sizes)) > 1:
+        raise ValueError("inconsistent number of scenarios in the scenario bank")
+    bank["S"] = sizes[0] if sizes else 1
+
+    return bank
+
+#rebuild the param dict of scenario s
+def getScenario(bank, s):
+    param = {k: int(bank[k]) for k in ["nF", "nC", "nP"]}
+    for k in PARAM_KEYS:
+        param[k] = bank[k][s] if bank[k].ndim > PARAM_NDIM[k] else bank[k]
+
+    return param
+
+def outShape(bank, maxSol, allocRange=True):
+    nF, nC = int(bank["nF"]), int(bank["nC"])
+    solDim = 2*nF*nC + nF if allocRange else nF*nC + nF
+    S = bank["S"]
+
+    return {"sol": (S, maxSol, solDim), "scPerf": (S, maxSol, 2), "factPerf": (S, maxSol, 2*nF),
+            "unutilCapPref": (S, maxSol), "perfCat": (S, maxSol)}
+
+#worker state, the scenario bank & output arrays are opened once per worker
+_worker = {}
+
+def _initWorker(bankPath, outDir, kwargs):
+    _worker["bank"] = loadScenarioBank(bankPath)
+    _worker["out"] = {k: np.load(os.path.join(outDir, k + ".npy"), mmap_mode="r+") for k in OUT_KEYS}
+    _worker["kwargs"] = kwargs
+
+#returns the scenario index, num of sol (-1 if it failed) & the error message
+def _planScenario(s):
+    bank, out = _worker["bank"], _worker["out"]
+    try:
+        res = orderPlanner.plan(getScenario(bank, s), **_worker["kwargs"])
+    except Exception:
+        return s, -1, traceback.format_exc()
+    n = min(res[0].shape[0], out["sol"].shape[1])
+    #write directly into the shared output, only the scenario index & num of sol are sent back
+    for k, v in zip(OUT_KEYS, res):
+        out[k][s, :n] = v[:n]
+        out[k].flush()
+
+    return s, n, None
+
+def planBatch(bankPath, outDir, R=20, T=20, factPrefReq=True, allocRange=True, nGen=50, popSize=20,
+              archiveSize=None, nWorkers=None, resume=True):
+    bank = loadScenarioBank(bankPath)
+    shape = outShape(bank, popSize if archiveSize is None else archiveSize, allocRange)
+    os.makedirs(outDir, exist_ok=True)
+
+    #create the memory-mapped outputs, keep finished scenarios when resuming an interrupted sweep
+    nSolPath = os.path.join(outDir, "nSol.npy")
+    exist = all(os.path.exists(os.path.join(outDir, k + ".npy")) for k in OUT_KEYS + ["nSol"])
+    if resume and exist:
+        nSol = np.load(nSolPath, mmap_mode="r+")
+        if nSol.shape[0] != bank["S"]:
+            raise ValueError("existing output in " + outDir + " does not match the scenario bank")
+        #e.g. a rerun with a different popSize, archiveSize or allocRange
+        for k in OUT_KEYS:
+            if np.load(os.path.join(outDir, k + ".npy"), mmap_mode="r").shape != shape[k]:
+                raise ValueError("existing " + k + ".npy in " + outDir + " does not match the planner settings")
+    else:
+        for k in OUT_KEYS:
+            out = np.lib.format.open_memmap(os.path.join(outDir, k + ".npy"), mode="w+", shape=shape[k])
+            out[:] = np.nan
+            out.flush()
+            del out
+        nSol = np.lib.format.open_memmap(nSolPath, mode="w+", dtype=np.int64, shape=(bank["S"],))
+        nSol[:] = -1
+    todo = [s for s in range(bank["S"]) if nSol[s] < 0]
+
+    kwargs = {"R": R, "T": T, "factPrefReq": factPrefReq, "allocRange": allocRange,
+              "nGen": nGen, "popSize": popSize, "archiveSize": archiveSize}
+    if nWorkers == 1:
+        _initWorker(bankPath, outDir, kwargs)
+        results = map(_planScenario, todo)
+        pool = None
+    else:
+        pool = mp.Pool(nWorkers, initializer=_initWorker, initargs=(bankPath, outDir, kwargs))
+        results = pool.imap_unordered(_planScenario, todo)
+    failed = {}
+    try:
+        for s, n, err in results:
+            if err is not None:
+                failed[s] = err
+                print("scenario", s, "failed:\n" + err)
+                continue
+            nSol[s] = n
+            nSol.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    out = {k: np.load(os.path.join(outDir, k + ".npy"), mmap_mode="r") for k in OUT_KEYS + ["nSol"]}
+    out["failed"] = failed #scenario index: traceback of the scenarios that raised
+
+    return out
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmark of the planning entry points
+- imports each module in a fresh interpreter (cold start) and reports the best wall time over nRun runs
+- lists the heavy dependencies (pymoo solvers, scipy, matplotlib) loaded by the import
+usage: python benchImport.py [nRun]
+@author: cstan
+"""
+
+import os
+import sys
+import subprocess
+
+ENTRY = ["model", "guassMixtureModel", "trNSGA2", "solve", "orderPlanner", "batchPlanner"]
+HEAVY = ["pymoo.optimize", "pymoo.algorithms", "pymoo.util.nds", "pymoo.indicators",
+         "scipy.stats", "scipy", "matplotlib"]
+
+CODE = """
+import sys, time
+t = time.perf_counter()
+import {mod}
+t = time.perf_counter() - t
+heavy = [h for h in {heavy} if h in sys.modules]
+print(t, ",".join(heavy))
+"""
+
+def coldImport(mod, nRun=5):
+    best, heavy = float("inf"), ""
+    for _ in range(nRun):
+        out = subprocess.run([sys.executable, "-c", CODE.format(mod=mod, heavy=HEAVY)], check=True,
+                             capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        t, _, heavy = out.stdout.strip().partition(" ")
+        best = min(best, float(t))
+
+    return best, heavy
+
+if __name__ == "__main__":
+    nRun = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print("%-20s %10s  %s" % ("module", "time (ms)", "heavy dependencies loaded"))
+    for mod in ["numpy"] + ENTRY:
+        t, heavy = coldImport(mod, nRun)
+        print("%-20s %10.1f  %s" % (mod, t*1000, heavy if heavy else "-"))
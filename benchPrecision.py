@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Validation of the float32 precision mode (model.PRECISIONS) against float64
+- precisionReport, obj values of a set of plans under each precision with the same scenarios, returns the abs & rel
+  difference to float64 per objective, the size of the cached scenario tensors & the evaluation time
+- the scenario tensors (R x nP x nC x T) are only cached by the non-mc samplers, with the default mc sampler the
+  demand is drawn per replication & float32 only changes the accuracy, not the memory held
+- run as a script to report on random plans of the sample problem (sampleProblem.py), mc & lhs samplers
+usage: python benchPrecision.py [nPlan]
+@author: cstan
+"""
+
+import sys
+import time
+import numpy as np
+
+import model as mop
+from sampleProblem import sampleParam
+
+def precisionReport(param, X, R=20, T=20, sampler="mc", objectives=mop.OBJECTIVES):
+    F, nBytes, sec = {}, {}, {}
+    for p in mop.PRECISIONS:
+        problem = mop.AllocProblem(param, R, objectives, sampler=sampler, precision=p, T=T)
+        start = time.perf_counter()
+        F[p] = np.array([problem.experiment(x) for x in X])
+        sec[p] = time.perf_counter() - start
+        z, u = problem.scenarioDraws(T)
+        nBytes[p] = 0 if z is None else z.nbytes + u.nbytes #none cached for mc
+
+    absDiff = np.abs(F["float32"] - F["float64"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        relDiff = np.where(np.abs(F["float64"]) > 0, absDiff / np.abs(F["float64"]), 0)
+
+    return {"objectives": list(objectives), "F": F, "maxAbs": np.nanmax(absDiff, axis=0),
+            "meanRel": np.nanmean(relDiff, axis=0), "bytes": nBytes, "sec": sec}
+
+if __name__ == "__main__":
+    nPlan = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    param = sampleParam()
+    X = np.random.RandomState(0).rand(nPlan, param["nF"]*param["nC"] + param["nF"])
+
+    for sampler in ["mc", "lhs"]:
+        rep = precisionReport(param, X, sampler=sampler)
+        print("float32 vs float64 over", nPlan, "random plans,", sampler, "sampler")
+        print("%-14s %12s %12s" % ("objective", "max abs diff", "mean rel diff"))
+        for o, a, r in zip(rep["objectives"], rep["maxAbs"], rep["meanRel"]):
+            print("%-14s %12.5f %12.2e" % (o, a, r))
+        for p in mop.PRECISIONS:
+            print("%-8s cached scenario tensors %8d bytes, evaluation %.2f sec" % (p, rep["bytes"][p], rep["sec"][p]))
+        print()
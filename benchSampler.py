@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Diagnostic of the scenario samplers (model.SAMPLERS)
+- samplerStdErr, standard error of the objective estimate of a plan with R replications, estimated from
+  nBatch independent estimates (different seeds) for each sampler
+- run as a script to compare the samplers on the sample problem of main.py for a few R
+usage: python benchSampler.py [nBatch]
+@author: cstan
+"""
+
+import sys
+import numpy as np
+
+import model as mop
+from sampleProblem import sampleParam
+
+def samplerStdErr(param, x, R, samplers=mop.SAMPLERS, nBatch=20, T=20, objectives=("aveLT", "unUtilHr")):
+    stdErr = {}
+    for s in samplers:
+        est = np.zeros((nBatch, len(objectives)))
+        for k in range(nBatch):
+            #mc uses seed + r for replication r, keep the batches of replications disjoint
+            problem = mop.AllocProblem(param, R, objectives, sampler=s, seed=k*R if s == "mc" else k)
+            est[k] = problem.experiment(x, T)
+        stdErr[s] = est.std(axis=0, ddof=1)
+
+    return stdErr
+
+if __name__ == "__main__":
+    nBatch = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    param = sampleParam()
+    nFact, nCust = param["nF"], param["nC"]
+    #balanced allocation, min production hr at half of the max hr
+    x = np.full(nFact*nCust + nFact, 0.5)
+
+    print("std. error of (average fulfilment time, unutilised hr) over", nBatch, "batches")
+    for R in [4, 6, 8, 16, 20]:
+        for s, se in samplerStdErr(param, x, R, nBatch=nBatch).items():
+            print("R = %2d  %-10s  %.4f  %.5f" % (R, s, se[0], se[1]))
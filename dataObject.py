@@ -18,7 +18,7 @@ class Order():
         self.fulfilmentTime = None
         
     def clone(self, qty):
-        return Order(self.cust, self.arrivalTime, qty)
+        return Order(self.cust, self.arrivalTime, qty, self.fact)
 
 class Factory():
     def __init__(self, f, maxHr, tLT):
@@ -27,6 +27,7 @@ class Factory():
         self.tLT = tLT #nC by 1 transportation lead time
         self.activeOrder = [] #active order to produce
         self.unUtilHr, self.totAvailHr = 0, 0
+        self.unUtilHr0, self.totAvailHr0 = 0, 0 #counters at the last reset/ restore
 
         self.dailyUnUtilHr = []
         self.dailyFillTime, self.dailyOrderFilled, self.dailyOrderAlloc = [], [], []
@@ -34,10 +35,27 @@ class Factory():
     def reset(self):
         self.activeOrder = []
         self.unUtilHr, self.totAvailHr = 0, 0
+        self.unUtilHr0, self.totAvailHr0 = 0, 0
 
         self.dailyUnUtilHr = []
         self.dailyFillTime, self.dailyOrderFilled, self.dailyOrderAlloc = [], [], []
 
+    #current state: active orders (cust, arrivalTime, remaining reqHr) & capacity counters
+    def snapshot(self):
+        return {"activeOrder": [(o.cust, o.arrivalTime, o.reqHr) for o in self.activeOrder],
+                "unUtilHr": self.unUtilHr, "totAvailHr": self.totAvailHr}
+
+    #reset to a given state, e.g. the live backlog of the factory, arrivalTime relative to the current time 0
+    def restore(self, state):
+        self.reset()
+        self.activeOrder = [Order(c, t, reqHr, self.id) for c, t, reqHr in state["activeOrder"]]
+        self.unUtilHr, self.totAvailHr = state["unUtilHr"], state["totAvailHr"]
+        self.unUtilHr0, self.totAvailHr0 = state["unUtilHr"], state["totAvailHr"]
+
+    #unutilised & available hr accumulated since the last reset/ restore, i.e. over the simulated horizon
+    def horizonHr(self):
+        return self.unUtilHr - self.unUtilHr0, self.totAvailHr - self.totAvailHr0
+
     def produce(self, currT, minPHr):
         completedOrder = []
         if minPHr < sum(o.reqHr for o in self.activeOrder):
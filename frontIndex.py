@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Persisted index of the Pareto fronts returned by orderPlanner.plan, for instant plan retrieval
+- problemKey (model.problemKey), hash of the problem parameters & settings identifying a front
+- FrontIndex, stores each front sorted on the unutilised capacity preference (one npz file per key in a folder)
+  together with its decoded allocations & performance
+    - getOrPlan, returns the stored front or runs the solver once & stores it
+    - lookup, nearest sol to a preference value (bisection) or a target obj value, optionally interpolates
+      between the 2 neighbouring sol & verifies the interpolated plan by simulation
+@author: cstan
+"""
+
+import os
+import numpy as np
+
+import model as mop
+import orderPlanner
+
+FRONT_KEYS = ["x", "sol", "scPerf", "factPerf", "unutilCapPref", "perfCat"]
+
+problemKey = mop.problemKey
+
+class FrontIndex():
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.fronts = {} #in-memory cache of the loaded fronts
+
+    def path(self, key):
+        return os.path.join(self.folder, key + ".npz")
+
+    #store the output of orderPlanner.plan (allocRange=True), sorted on the preference value
+    #R, T: replications & horizon scPerf was simulated with, an interpolated sol is verified with the same R & T
+    def add(self, key, param, result, R=20, T=20):
+        sol, scPerf, factPerf, unutilCapPref, perfCat = result
+        order = np.argsort(unutilCapPref, kind="stable")
+        front = {"x": orderPlanner.fromRange(sol, param)[order], "sol": sol[order], "scPerf": scPerf[order],
+                 "factPerf": factPerf[order], "unutilCapPref": unutilCapPref[order], "perfCat": perfCat[order],
+                 "R": np.array(R), "T": np.array(T)}
+        tmp = self.path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **front)
+        os.replace(tmp, self.path(key))
+        self.fronts[key] = front
+
+        return front
+
+    def get(self, key):
+        if key not in self.fronts and os.path.exists(self.path(key)):
+            with np.load(self.path(key)) as data:
+                self.fronts[key] = {k: data[k] for k in FRONT_KEYS + ["R", "T"] if k in data.files}
+
+        return self.fronts.get(key)
+
+    def getOrPlan(self, param, R=20, T=20, nGen=50, popSize=20, archiveSize=None):
+        key = problemKey(param, R=R, T=T, nGen=nGen, popSize=popSize, archiveSize=archiveSize)
+        front = self.get(key)
+        if front is None:
+            front = self.add(key, param, orderPlanner.plan(param, R, T, True, True, nGen, popSize, archiveSize), R, T)
+
+        return key, front
+
+    #sol of front key closest to preference value pref (0 to 1) or to the target obj values target
+    #interpolate: blend the 2 sol around pref, the blend is returned only if its simulated performance
+    #(same R & T as the stored front) is not dominated by either neighbour, otherwise the nearest sol is returned
+    def lookup(self, key, pref=None, target=None, interpolate=False, param=None):
+        front = self.get(key)
+        if front is None: raise KeyError("no front stored for key " + key)
+        if (pref is None) == (target is None): raise ValueError("either pref or target is required")
+        p = front["unutilCapPref"]
+
+        if target is not None:
+            #nearest in the obj space normalised by the range of the front
+            obj = front["scPerf"][:, :len(target)]
+            span = obj.max(axis=0) - obj.min(axis=0)
+            span[span == 0] = 1
+            i = int(np.argmin(np.sum(((obj - np.asarray(target)) / span)**2, axis=1)))
+            return self._entry(front, i)
+
+        j = int(np.clip(np.searchsorted(p, pref), 1, p.shape[0] - 1))
+        i = j if abs(p[j] - pref) < abs(p[j - 1] - pref) else j - 1
+        #exact hit on a stored preference value needs no blend
+        if not interpolate or p[j] == p[j - 1] or pref <= p[0] or pref >= p[-1] or pref in (p[j - 1], p[j]):
+            return self._entry(front, i)
+        if param is None: raise ValueError("param is required to verify an interpolated sol")
+        if "T" not in front: raise ValueError("front " + key + " was stored without R/ T, it cannot be interpolated")
+
+        #blend the decision variables of the 2 neighbours & verify it
+        w = (pref - p[j - 1]) / (p[j] - p[j - 1])
+        x = (1 - w) * front["x"][j - 1] + w * front["x"][j]
+        problem = mop.AllocProblem(param, int(front["R"]), T=int(front["T"]))
+        scPerf = np.array(problem.experiment(x))
+        for k in [j - 1, j]:
+            if np.all(front["scPerf"][k] <= scPerf) and np.any(front["scPerf"][k] < scPerf):
+                return self._entry(front, i)
+        share = orderPlanner.toShare(x[None], param)
+
+        return {"x": x, "sol": orderPlanner.toRange(share, param)[0], "scPerf": scPerf, "factPerf": None,
+                "unutilCapPref": pref, "perfCat": orderPlanner.categorise([pref], p.shape[0])[0], "interpolated": True}
+
+    def _entry(self, front, i):
+        entry = {k: front[k][i] for k in FRONT_KEYS}
+        entry["interpolated"] = False
+
+        return entry
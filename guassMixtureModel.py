@@ -6,13 +6,15 @@
 """
 
 import numpy as np
-from scipy.stats import multivariate_normal
 
 class GuassModel():
     def __init__(self, sol=None):
         self.dim = None
-        self.mean, self.cov = None, None
-        self.mean_noisy, self.cov_noisy = None, None
+        #diagonal covariance, stored as a vector of variances
+        self.mean, self.var = None, None
+        self.mean_noisy, self.var_noisy = None, None
+        #full covariance, only kept when the src distribution has correlated variables
+        self.cov, self.cov_noisy = None, None
         
         if sol is not None: self.build_frm_sol(sol)
         
@@ -20,20 +22,30 @@ class GuassModel():
     def build_frm_sol(self, sol):
         self.dim = sol.shape[1]
         self.mean = np.mean(sol, axis=0)
-        self.cov = np.diag(np.diag(np.cov(sol.T))) # assume indenpendence among varaible
+        self.var = np.var(sol, axis=0, ddof=1) # assume indenpendence among varaible
         
         #create 20% of random solution
         rand_sol = np.random.rand(int(0.2*sol.shape[0]), sol.shape[1])
         sol_noisy = np.vstack([sol, rand_sol])
         self.mean_noisy = np.mean(sol_noisy, axis=0)
-        self.cov_noisy = np.diag(np.diag(np.cov(sol_noisy.T))) # assume indenpendence among varaible
+        self.var_noisy = np.var(sol_noisy, axis=0, ddof=1) # assume indenpendence among varaible
+        self.cov, self.cov_noisy = None, None
         
     
-    #initial the distribution parameters
+    #initial the distribution parameters, cov is either a vector of variances or a covariance matrix
     def build_from_param(self, mean, cov):
         self.dim = mean.shape[0]
-        self.mean, self.mean_noisy = mean, mean    
-        self.cov, self.cov_noisy = cov, cov*1.2
+        self.mean, self.mean_noisy = mean, mean
+        self.var, self.var_noisy, self.cov, self.cov_noisy = None, None, None, None
+        if cov.ndim == 1:
+            self.var, self.var_noisy = cov, cov*1.2
+        elif np.count_nonzero(cov - np.diag(np.diag(cov))) == 0: #diagonal matrix
+            self.var, self.var_noisy = np.diag(cov).copy(), np.diag(cov)*1.2
+        else:
+            self.cov, self.cov_noisy = cov, cov*1.2
+
+    def is_diag(self):
+        return self.cov is None
         
     #ensure that the dimensionality of src & tar problem are the same
     def mod_dim(self, dim):
@@ -42,8 +54,12 @@ class GuassModel():
             self.mean = self.mean[:dim]
             self.mean_noisy = self.mean_noisy[:dim]
             
-            self.cov = self.cov[:dim, : dim]
-            self.cov_noisy = self.cov_noisy[:dim, : dim]
+            if self.is_diag():
+                self.var = self.var[:dim]
+                self.var_noisy = self.var_noisy[:dim]
+            else:
+                self.cov = self.cov[:dim, : dim]
+                self.cov_noisy = self.cov_noisy[:dim, : dim]
             
         #pad it with with mean 0.5, var 1
         elif dim > self.dim:
@@ -52,21 +68,58 @@ class GuassModel():
             self.mean = mean_dim.copy()
             self.mean_noisy = mean_dim.copy()
             
-            cov_dim = np.diag(np.ones(dim))
-            cov_dim[:self.dim, :self.dim] = self.cov
-            self.cov = cov_dim.copy()
-            self.cov_noisy = cov_dim.copy()
+            if self.is_diag():
+                var_dim = np.ones(dim)
+                var_dim[:self.dim] = self.var
+                self.var = var_dim.copy()
+                self.var_noisy = var_dim.copy()
+            else:
+                cov_dim = np.diag(np.ones(dim))
+                cov_dim[:self.dim, :self.dim] = self.cov
+                self.cov = cov_dim.copy()
+                self.cov_noisy = cov_dim.copy()
+        self.dim = dim
             
     #sampling based on actual distribution
-    def sample(self, sampleSize):      
+    def sample(self, sampleSize):
+        if self.is_diag():
+            return self.mean + np.sqrt(self.var)*np.random.standard_normal((sampleSize, self.mean.shape[0]))
         return np.random.multivariate_normal(self.mean, self.cov, sampleSize)
 
+    #log prob density evaluation based on noisy distribution, s is a sol (dim) or a set of sol (n by dim)
+    #evaluated in float64 whatever the precision of the sol, the densities underflow in float32
+    def logPdFunc(self, s):
+        s = np.asarray(s, dtype=np.float64)
+        if self.is_diag():
+            return -0.5*(np.sum(np.log(2*np.pi*self.var_noisy))
+                         + np.sum((s - self.mean_noisy)**2 / self.var_noisy, axis=-1))
+        from scipy.stats import multivariate_normal #loaded on first use, scipy.stats is slow to import
+        return multivariate_normal.logpdf(s, mean=self.mean_noisy, cov=self.cov_noisy)
+
     #prob density evaluation based on noisy distribution
     def pdFunc(self, s):
-        return multivariate_normal.pdf(s, mean=self.mean_noisy, cov=self.cov_noisy)
+        return np.exp(self.logPdFunc(s))
+
+    #distribution parameters as a dict of arrays, e.g. for checkpointing
+    def getState(self):
+        state = {}
+        for k in ["mean", "var", "mean_noisy", "var_noisy", "cov", "cov_noisy"]:
+            if getattr(self, k) is not None: state[k] = getattr(self, k)
+        if self.dim is not None: state["dim"] = np.array(self.dim)
+
+        return state
+
+    def setState(self, state):
+        for k in ["mean", "var", "mean_noisy", "var_noisy", "cov", "cov_noisy"]:
+            setattr(self, k, state.get(k))
+        self.dim = int(state["dim"]) if "dim" in state else None
 
 class GuassMixtureModel():
-    def __init__(self, srcModel):
+    #pruneTol: a src model whose transfer coefficient stays below pruneTol for pruneGen updates is retired,
+    #it is no longer evaluated nor sampled; retired models are re-evaluated every reactivateInt updates & are
+    #reactivated if their coefficient is back above pruneTol (reactivateInt None: never)
+    #dtype: float type of the samples, see model.PRECISIONS
+    def __init__(self, srcModel, pruneTol=1e-3, pruneGen=3, reactivateInt=10, dtype=np.float64):
         self.model = [*srcModel] #srcModwl
         self.model.append(GuassModel()) #tarModel
         self.mTot = len(self.model)
@@ -75,36 +128,48 @@ class GuassMixtureModel():
         self.trf = np.ones(self.mTot)/ self.mTot #transfer coefficient
         self.trf_records = []
 
+        self.pruneTol, self.pruneGen, self.reactivateInt = pruneTol, pruneGen, reactivateInt
+        self.active = np.ones(self.mTot, dtype=bool) #tarModel is always active
+        self.lowCount = np.zeros(self.mTot, dtype=int) #consecutive updates with trf below pruneTol
+        self.nUpdate = 0
+        self.dtype = dtype
+
     def update(self, tarSol):
+        self.nUpdate += 1
+        #probe the retired models, they are retired again right away if their coefficient is still low
+        if self.reactivateInt is not None and self.nUpdate % self.reactivateInt == 0: self.active[:] = True
         self.computeProb(tarSol)
         self.computeTrf()
 
     def computeProb(self, tarSol):
         self.model[-1].build_frm_sol(tarSol)
-        self.probTable = np.ones([tarSol.shape[0], self.mTot])
+        self.probTable = np.zeros([tarSol.shape[0], self.mTot])
         
-        #src model: compute pdf of each sol
-        for m in range(self.mTot-1):
+        #src model: compute pdf of each sol, active models only
+        for m in np.flatnonzero(self.active[:-1]):
             self.probTable[:, m] = self.model[m].pdFunc(tarSol)
         #target model: compute pdf of sol i with Guassian Model built without sol i
         for i in range(tarSol.shape[0]):  # Leave-one-out cross validation
             x = np.concatenate((tarSol[:i, :], tarSol[i+1:, :]))
             tarModel = GuassModel(sol=x)
-            self.probTable[i, -1] = tarModel.pdFunc(tarSol[[i], :])
+            self.probTable[i, -1] = tarModel.pdFunc(tarSol[i, :])
     
-    #determine transfer coefficient with emStacking
+    #determine transfer coefficient with emStacking, over the active models
     def computeTrf(self, nIter=100, perturb=True):
+        act = np.flatnonzero(self.active)
+        probTable = self.probTable[:, act]
         #reset transfer coefficient
-        self.trf = np.ones(self.mTot)/ self.mTot
+        trf = np.ones(act.shape[0])/ act.shape[0]
         for i in range(nIter):
-            probVector = np.matmul(self.probTable, self.trf.T) #final weighted prob
-            for i in range(self.mTot):
-                self.trf[i] = np.sum((self.trf[i]*self.probTable[:, i]) / probVector)
-                self.trf[i] /= self.probTable.shape[0] #num of sol
-            self.trf = np.around(self.trf, decimals=5) #round it to neart 5 decimal place
+            probVector = np.matmul(probTable, trf) #final weighted prob
+            trf = np.sum(trf*probTable / probVector[:, None], axis=0) / probTable.shape[0] #num of sol
+            trf = np.around(trf, decimals=5) #round it to neart 5 decimal place
+        self.trf = np.zeros(self.mTot)
+        self.trf[act] = trf
         
         #record trf coeeficient b4 perturbation
-        self.trf_records.append(self.trf)
+        self.trf_records.append(self.trf.copy())
+        self.prune()
 
         #perturb transfer coefficient slightly
         if perturb: self.perturb()
@@ -117,20 +182,54 @@ class GuassMixtureModel():
         else:
             self.trf /= trf_sum
 
+    #retire the src models whose coefficient has stayed below pruneTol for pruneGen updates
+    def prune(self):
+        low = self.active & (self.trf < self.pruneTol)
+        self.lowCount[self.active] = np.where(low[self.active], self.lowCount[self.active] + 1, 0)
+        retire = low & (self.lowCount >= self.pruneGen)
+        retire[-1] = False
+        self.active[retire] = False
+        self.trf[retire] = 0
+
+    #model & transfer coefficient state as a flat dict of arrays, e.g. for checkpointing
+    def getState(self):
+        state = {"trf": self.trf, "trf_records": np.array(self.trf_records).reshape(-1, self.mTot),
+                 "active": self.active, "lowCount": self.lowCount, "nUpdate": np.array(self.nUpdate)}
+        if self.probTable is not None: state["probTable"] = self.probTable
+        for m in range(self.mTot):
+            for k, v in self.model[m].getState().items():
+                state["m" + str(m) + "_" + k] = v
+
+        return state
+
+    def setState(self, state):
+        if state["trf"].shape[0] != self.mTot:
+            raise ValueError("state does not match the number of models in the mixture")
+        self.trf = state["trf"].copy()
+        self.trf_records = [t.copy() for t in state["trf_records"]]
+        self.probTable = state.get("probTable")
+        self.active = state["active"].copy() if "active" in state else np.ones(self.mTot, dtype=bool)
+        self.lowCount = state["lowCount"].copy() if "lowCount" in state else np.zeros(self.mTot, dtype=int)
+        self.nUpdate = int(state["nUpdate"]) if "nUpdate" in state else len(self.trf_records)
+        for m in range(self.mTot):
+            prefix = "m" + str(m) + "_"
+            self.model[m].setState({k[len(prefix):]: v for k, v in state.items() if k.startswith(prefix)})
+
+    #perturb the coefficient of the active models slightly
     def perturb(self):
-        self.trf = np.maximum(self.trf + np.random.normal(0, 0.01, self.mTot), 0)
+        act = np.flatnonzero(self.active)
+        self.trf[act] = np.maximum(self.trf[act] + np.random.normal(0, 0.01, act.shape[0]), 0)
 
     def sample(self, sampleSize):
-        modelSampleSize = np.ceil(sampleSize*self.trf).astype(int) #number of samples for each model
-        modelSampleSize[-1] -= modelSampleSize.sum() - sampleSize
-        sol = np.array([])-sampleSize
-        for i in range(self.mTot):
-            if modelSampleSize[i] > 0:
-                s = self.model[i].sample(modelSampleSize[i])
-                sol = np.vstack([sol, s]) if sol.size else s
+        #number of samples for each model, retired models have trf 0
+        modelSampleSize = np.random.multinomial(sampleSize, self.trf / self.trf.sum())
+        sol = np.empty((sampleSize, self.model[-1].dim), dtype=self.dtype)
+        start = 0
+        for i in np.flatnonzero(modelSampleSize):
+            sol[start:start + modelSampleSize[i]] = self.model[i].sample(modelSampleSize[i])
+            start += modelSampleSize[i]
         
         #shuffle the solutions
-        sol = sol[np.random.permutation(sol.shape[0]), :]
-        sol = sol[:sampleSize, :]
+        np.random.shuffle(sol)
         
-        return sol
\ No newline at end of file
+        return sol
@@ -8,26 +8,14 @@ Sample code to,
 """
 
 import numpy as np
-from pymoo.indicators.hv import HV
 
 import model as mop
 import solve as planner
+from resultStore import SimResult
+from sampleProblem import sampleParam
 
-#setting up problem parameters
-nFact, nCust, nPrdt = 3, 3, 2
-tLT = np.ones((nFact, nCust))
-tLT[0, 1], tLT[1, 0], tLT[2, 1], tLT[1, 2] = 2, 2, 2, 2
-tLT[0, 2], tLT[2, 0] = 3, 3
-
-#maxHr: avialable hours per day for each factory
-#pRate: production rate (qty/ hr) for each product per factory (nPrdt x nFact)
-#aveD: average demand for each product per customer (nPrdt x nCust)
-param = {"nF": nFact, "nC": nCust, "nP": nPrdt,
-         "tLT": tLT, "maxHr":np.array([10, 10, 10]),
-         "pRate": np.array([[15.6, 5.2, 15.6], [10.4, 10.4, 5.2]]),
-         "aveD": np.array([[60, 20, 30], [40, 40, 10]]),
-         #"devD": np.array([[0.2, 0.2, 0.2], [0.2, 0.2, 0.2]])}
-         "devD": np.array([[0.3, 0.2, 0.2], [0.1, 0.1, 0.1]])}
+#setting up problem parameters, see sampleProblem.py
+param = sampleParam()
 
 R = 20 #num of replications
 T = 20 #planning horizon length
@@ -43,38 +31,35 @@ for i in range(x3.shape[0]):
     #for j in range():
         #for k in range()
     # run for "r" replications
-    aveUnUtilHr, aveLT = {}, {}
-    for f in range(param["nF"]): aveUnUtilHr[f], aveLT[f] = 0, 0
+    aveUnUtilHr, aveLT = np.zeros(param["nF"]), np.zeros(param["nF"])
     for r in range(R):
         np.random.seed(r)
         for f in problem.factory: f.reset()
         projDemand = problem.simDemand(T)  # sample demand from distribution
         # print()
-        completedOrder = problem.simPlan(projDemand, alloc, minPHr, T)  # simulate planning scenarios
+        res = SimResult(param["nF"], T, T*param["nC"])
+        problem.simPlan(projDemand, alloc, minPHr, T, store=res)  # simulate planning scenarios
         # compute perf
-        unUtilHr, lt, _, _, _, _ = problem.computePrefFact(completedOrder)
-
-        for f in range(param["nF"]):
-            aveLT[f] += lt[f]
-            aveUnUtilHr[f] += unUtilHr[f]
+        aveLT += res.factAveLT()
+        aveUnUtilHr += res.factUnUtil()
 
-    for f in range(param["nF"]):
-        y3Ext[i, f*2] = aveLT[f]/R
-        y3Ext[i, (f*2)+1] = aveUnUtilHr[f]/R
+    y3Ext[i, 0::2] = aveLT/R
+    y3Ext[i, 1::2] = aveUnUtilHr/R
 
 #simulate actual scenario using first sol with a different random seed num, i.e. 11
 x = x3[-1]
 alloc, minPHr = problem.decode(x)
-aveUnUtilHr, aveLT = {}, {}
-for f in range(param["nF"]): aveUnUtilHr[f], aveLT[f] = 0, 0
 #print()
 np.random.seed(20)
 for f in problem.factory: f.reset()
 projDemandPlan = problem.simDemand(50)  # sample demand from distribution
 #print()
-completedOrderPlan = problem.simPlan(projDemandPlan, alloc, minPHr, 50)  # simulate actual scenarios
-# compute perf
-_, _, dailyUnUtilHr, dailyOrderAlloc, dailyOrderFilled, dalilyOrderFillTime = problem.computePrefFact(completedOrderPlan)
+resPlan = SimResult(param["nF"], 50, 50*param["nC"])
+problem.simPlan(projDemandPlan, alloc, minPHr, 50, store=resPlan)  # simulate actual scenarios
+# daily perf, nF by 50
+dailyUnUtilHr, dailyOrderAlloc, dailyOrderFilled, dalilyOrderFillTime = \
+    resPlan.dailyUnUtilHr, resPlan.dailyOrderAlloc, resPlan.dailyOrderFilled, resPlan.dailyFillTime
+#resPlan.save("planResult.npz") #export orders & daily records, e.g. for dashboard
 
 import matplotlib.pyplot as plt
 #plt.scatter(y1[:,0], y1[:,1])
@@ -84,6 +69,8 @@ plt.legend(["no trasfer-Pymoo", "no trasfer", "with transfer"])
 plt.show()
 
 '''
+from pymoo.indicators.hv import HV
+
 #find ref point
 rPt = np.array([max(np.amax(y1[:,0]), np.amax(y2[:,0]), np.amax(y3[:,0])),
                 max(np.amax(y1[:,1]), np.amax(y2[:,1]), np.amax(y3[:,1]))])
@@ -7,15 +7,72 @@ Order planning optimization problem and defines
 @author: cstan
 """
 #external lib
+import hashlib
 import numpy as np
 from pymoo.core.problem import Problem
 #internal lib
 import dataObject as obj
+from sketch import QuantileSketch
+from resultStore import SimResult, DAILY_COLS
+
+#performance measures that can be used as objectives
+# - aveLT, average fulfilment lead time
+# - unUtilHr, average unutilized capacity %
+# - loadImbalance, std. dev. of the factory load (utilised hr/ available hr over the horizon) across factories
+# - p90LT, p95LT, 90th & 95th percentile of the fulfilment lead time
+# - maxCustP95LT, maxFactP95LT, worst 95th percentile of the fulfilment lead time among customers/ factories
+#   percentiles are taken from a quantile sketch of all orders fulfilled over the R replications
+OBJECTIVES = ["aveLT", "unUtilHr", "loadImbalance", "p90LT", "p95LT", "maxCustP95LT", "maxFactP95LT"]
+QUANTILE_OBJECTIVES = {"p90LT": (0.9, None), "p95LT": (0.95, None),
+                       "maxCustP95LT": (0.95, "cust"), "maxFactP95LT": (0.95, "fact")} #quantile, grouping
+#scenario samplers for the demand & allocation random numbers of the R replications
+# - mc, independent draws with seed (seed + r) for replication r
+# - lhs, Latin hypercube over all draws of a replication
+# - sobol, scrambled Sobol quasi-Monte Carlo over all draws of a replication, drawn in blocks of a power of 2,
+#   the first R points are used (R as a power of 2 keeps the balance of the sequence)
+#no antithetic sampler: mirroring (z, u) to (-z, 1-u) sends an order to another factory & the lead time is U-shaped
+#in the demand, the mirrored replications are positively correlated & the std. error grows
+SAMPLERS = ["mc", "lhs", "sobol"]
+#float & int types of the demand, hour, queue & scenario arrays for each precision setting
+#float32 halves the memory of the scenario tensors, the obj values & pdf evaluations are kept in float64
+PRECISIONS = {"float64": (np.float64, np.int64), "float32": (np.float32, np.int32)}
+#problem parameters identifying a problem, see problemKey
+KEY_PARAMS = ["nF", "nC", "nP", "tLT", "maxHr", "pRate", "aveD", "devD"]
+
+#hash of the problem parameters & settings, e.g. to match stored fronts or checkpoints to a problem
+def problemKey(param, **settings):
+    h = hashlib.sha1()
+    for k in KEY_PARAMS:
+        v = np.ascontiguousarray(param[k], dtype=float)
+        h.update(k.encode() + str(v.shape).encode() + v.tobytes())
+    for k in sorted(settings):
+        h.update((k + "=" + repr(settings[k])).encode())
+
+    return h.hexdigest()[:16]
 
 class AllocProblem(Problem):
-    def __init__(self, param, R):
+    #screen: plans whose expected load exceeds the capacity of a factory by more than screenTol (fraction of maxHr),
+    #or that leave a customer unallocated, are not simulated but get an analytic obj estimate & a constraint violation
+    #precision: one of PRECISIONS, e.g. "float32" to run the simulation arrays in float32/ int32
+    #T: planning horizon of the simulation of each replication
+    def __init__(self, param, R, objectives=("aveLT", "unUtilHr"), sampler="mc", seed=0, screen=False, screenTol=0.0,
+                 precision="float64", T=20):
         self.R = R  # number of replications for the projected allocation/ demand
+        self.T = T
         self.p = param
+        for o in objectives:
+            if o not in OBJECTIVES: raise ValueError("unknown objective " + str(o))
+        self.objectives = list(objectives)
+        if sampler not in SAMPLERS: raise ValueError("unknown sampler " + str(sampler))
+        self.sampler, self.seed = sampler, seed
+        if precision not in PRECISIONS: raise ValueError("unknown precision " + str(precision))
+        self.precision = precision
+        self.fdt, self.idt = PRECISIONS[precision]
+        self.pRate = np.asarray(self.p["pRate"], dtype=self.fdt)
+        self.draws = {} #scenario draws of the non-mc samplers for each horizon length
+        self.screen, self.screenTol = screen, screenTol
+        # expected production hr of an order of customer c at factory f, nC by nF
+        self.hrMat = (np.asarray(self.p["aveD"], dtype=self.fdt)[:, :, None] / self.pRate[:, None, :]).sum(axis=0)
         # allocation for all orders and min. production qty for all timestep
         self.nVar = self.p["nF"]*self.p["nC"] + self.p["nF"]
         self.currDemand = None  # nC by 1
@@ -23,51 +80,113 @@ class AllocProblem(Problem):
         self.factory = None  # factory list
         self.initiFactory()
 
-        super().__init__(n_var=self.nVar, n_obj=2, n_constr=0, xl=0.0, xu=1.0)
+        super().__init__(n_var=self.nVar, n_obj=len(self.objectives), n_constr=1 if screen else 0, xl=0.0, xu=1.0)
 
     def _evaluate(self, x, out, *args, **kwargs):
-        aveLT, aveUnUtil = np.zeros(x.shape[0]), np.zeros(x.shape[0])
-        for i in range(x.shape[0]):
-            aveLT[i], aveUnUtil[i] = self.experiment(x[i])
+        F = np.zeros((x.shape[0], self.n_obj))
+        sim = np.ones(x.shape[0], dtype=bool)
+        if self.screen:
+            G, F_est = self.screenPlan(x)
+            sim = G[:, 0] <= 0 #only plausible plans are simulated
+            F[~sim] = F_est[~sim]
+            out["G"] = G
+        for i in np.flatnonzero(sim):
+            F[i] = self.experiment(x[i])
+
+        out["F"] = F
+
+    #expected allocation share (n by nC by nF) & load (hr per day, n by nF) of plans X (n by nVar) under mean demand
+    #a customer without allocation is spread evenly over the factories & flagged as degenerate
+    def expectedLoad(self, X):
+        nF, nC = self.p["nF"], self.p["nC"]
+        share = np.asarray(X, dtype=float)[:, :nF*nC].reshape(-1, nC, nF)
+        total = share.sum(axis=2, keepdims=True)
+        degenerate = np.any(total[:, :, 0] <= 0, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(total > 0, share / total, 1 / nF)
+        load = np.einsum("ncf,cf->nf", share, self.hrMat)
 
-        out["F"] = np.column_stack([aveLT, aveUnUtil])
+        return share, load, degenerate
+
+    #capacity screening of plans X, returns the constraint violation G (n by 1, > 0 is infeasible)
+    #& analytic obj estimate (n by n_obj) assuming queues grow linearly at overloaded factories over T
+    def screenPlan(self, X, T=None):
+        if T is None: T = self.T
+        share, load, degenerate = self.expectedLoad(X)
+        maxHr = np.asarray(self.p["maxHr"], dtype=float)
+        rho = load / maxHr
+        G = (rho.max(axis=1) - 1 - self.screenTol)[:, None]
+        G[degenerate] = np.maximum(G[degenerate], 1)
+
+        #lead time of an order: transport + 1 day + waiting behind the backlog, which is uniform on [0, (rho-1)*T]
+        over = np.maximum(rho - 1, 0)[:, None, :] * T #n by 1 by nF
+        base = np.asarray(self.p["tLT"], dtype=float).T[None] + 1 #1 by nC by nF
+        custLT = lambda q: np.sum(share * (base + q * over), axis=2) #n by nC
+        F = np.zeros((X.shape[0], self.n_obj))
+        for i, o in enumerate(self.objectives):
+            if o == "aveLT": F[:, i] = custLT(0.5).mean(axis=1)
+            elif o == "unUtilHr": F[:, i] = np.maximum(maxHr - load, 0).sum(axis=1) / maxHr.sum()
+            elif o == "loadImbalance": F[:, i] = np.minimum(rho, 1).std(axis=1)
+            elif o in QUANTILE_OBJECTIVES:
+                q, by = QUANTILE_OBJECTIVES[o]
+                if by is None: F[:, i] = custLT(q).mean(axis=1)
+                elif by == "cust": F[:, i] = custLT(q).max(axis=1)
+                else: F[:, i] = (base.mean(axis=1) + q * over[:, 0, :]).max(axis=1)
+
+        return G, F
+
+    #key of the problem parameters & of every setting that changes the obj values
+    def key(self):
+        return problemKey(self.p, R=self.R, T=self.T, objectives=self.objectives, sampler=self.sampler, seed=self.seed,
+                          screen=self.screen, screenTol=self.screenTol, precision=self.precision)
 
     def initiFactory(self):
         self.factory = []
         for f in range(self.p["nF"]):
             self.factory.append(obj.Factory(
-                f, self.p["maxHr"][f], self.p["tLT"][f]
+                f, self.fdt(self.p["maxHr"][f]), self.p["tLT"][f]
             ))
 
+    def newSketch(self):
+        return QuantileSketch(self.p["nF"], self.p["nC"])
+
     # last term of currX & projX is the minPQty
-    def experiment(self, x, T=20):
+    #sketch: if given, the fulfilment times of all replications are merged into it, e.g. to merge across workers
+    def experiment(self, x, T=None, sketch=None):
+        if T is None: T = self.T
         # decision variables/ allocation & production plan
         alloc, minPHr = self.decode(x)
         #print("Min production hr", minPHr)
         # run for "r" replications
-        aveLT, aveUnUtilHr = 0, 0
+        aveObj = np.zeros(self.n_obj)
+        z, u = self.scenarioDraws(T)
+        quantileObj = any(o in QUANTILE_OBJECTIVES for o in self.objectives)
+        if sketch is None and quantileObj: sketch = self.newSketch()
 
         for r in range(self.R):
             # np.random.seed(r) #fixed random seed based on replication number
-            np.random.seed(r)
+            np.random.seed(self.seed + r)
             #print("Replication", r)
             # reset problem settings
             for f in self.factory: f.reset()
-            projDemand = self.simDemand(T) #sample demand from distribution
-            #print()
-            completedOrder = self.simPlan(projDemand, alloc, minPHr, T) #simulate planning scenarios
-            #compute perf
-            lt, unUtilHr = self.computePref(completedOrder)
-            aveLT += lt
-            aveUnUtilHr += unUtilHr
+            if z is None:
+                projDemand = self.simDemand(T) #sample demand from distribution
+                completedOrder = self.simPlan(projDemand, alloc, minPHr, T, sketch=sketch) #simulate planning scenarios
+            else:
+                projDemand = self.simDemand(T, z[r])
+                completedOrder = self.simPlan(projDemand, alloc, minPHr, T, u[r], sketch=sketch)
+            #compute perf, percentiles are computed once from the merged sketch
+            aveObj += self.computeObj(completedOrder, T)
 
-        aveLT /= self.R
-        aveUnUtilHr /= self.R
+        aveObj /= self.R
+        if quantileObj:
+            for i, o in enumerate(self.objectives):
+                if o in QUANTILE_OBJECTIVES: aveObj[i] = self.computeQuantileObj(o, sketch)
 
-        return aveLT, aveUnUtilHr
+        return tuple(aveObj)
 
     def decode(self, x):
-        alloc = np.zeros((self.p["nF"], self.p["nC"]))  # values, nF by nC
+        alloc = np.zeros((self.p["nF"], self.p["nC"]), dtype=self.fdt)  # values, nF by nC
         # determine demand allocation percentage
         for c in range(self.p["nC"]):
             # curr demand allocation
@@ -75,79 +194,141 @@ class AllocProblem(Problem):
             alloc[:, c] = alloc[:, c] / alloc[:, c].sum()  # normalise it
             # compute cummulative prob
             for f in range(1, self.p["nF"]): alloc[f, c] += alloc[f - 1, c]
+            if not np.isnan(alloc[-1, c]): alloc[-1, c] = 1 #guard against the rounding of the cumulative sum
             # print("Allocation for C", c, ":", alloc[:, c])
-        minPHr = x[self.p["nF"] * self.p["nC"]:] * self.p["maxHr"]
+        minPHr = (x[self.p["nF"] * self.p["nC"]:] * self.p["maxHr"]).astype(self.fdt)
 
         return alloc, minPHr
 
-    def simDemand(self, T):
+    #z: standard normal draws (nP by nC by T) from a scenario sampler, drawn here if not given
+    def simDemand(self, T, z=None):
         # generate demand projection trajectory
-        projDemand = np.zeros((self.p["nP"], self.p["nC"], T))
-        for p in range(self.p["nP"]):
-            for c in range(self.p["nC"]):
-                mu, sigma = self.p["aveD"][p][c], self.p["aveD"][p][c] * self.p["devD"][p][c]
-                projDemand[p][c] = np.random.normal(mu, sigma, T)
+        projDemand = np.zeros((self.p["nP"], self.p["nC"], T), dtype=self.fdt)
+        if z is not None:
+            mu = np.asarray(self.p["aveD"], dtype=self.fdt)
+            projDemand = mu[:, :, None] + (mu * np.asarray(self.p["devD"], dtype=self.fdt))[:, :, None] * z
+        else:
+            for p in range(self.p["nP"]):
+                for c in range(self.p["nC"]):
+                    mu, sigma = self.p["aveD"][p][c], self.p["aveD"][p][c] * self.p["devD"][p][c]
+                    projDemand[p][c] = np.random.normal(mu, sigma, T)
         projDemand[projDemand < 0] = 0  # convert negative value to zero
-        projDemand = (np.rint(projDemand)).astype(int)  # round demand to nearest integer
+        projDemand = (np.rint(projDemand)).astype(self.idt)  # round demand to nearest integer
         # print("Demand Generated", projDemand)
 
         return projDemand
 
-    def simPlan(self, projDemand, alloc, minPHr, T):
+    #demand normals (R by nP by nC by T) & allocation uniforms (R by T by nC) of the sampler, (None, None) for mc
+    def scenarioDraws(self, T):
+        if self.sampler == "mc": return None, None
+        if T not in self.draws:
+            z, u = sampleScenarios(self.p["nP"], self.p["nC"], T, self.R, self.sampler, self.seed)
+            self.draws[T] = z.astype(self.fdt, copy=False), u.astype(self.fdt, copy=False)
+
+        return self.draws[T]
+
+    #rand: pre-drawn allocation uniforms (T by nC), drawn during the simulation if not given
+    #sketch: QuantileSketch that the fulfilment time of each completed order is fed into
+    #store: SimResult that the completed orders & daily factory records are written into
+    def simPlan(self, projDemand, alloc, minPHr, T, rand=None, sketch=None, store=None):
         completedOrder = []
+        #demand in the precision of the problem, so the production hr of the orders stay in self.fdt
+        projDemand = np.asarray(projDemand).astype(self.fdt, copy=False)
         # print("======Simulation for proj demand======")
         # allocation of proj demand
         for t in range(0, T):
             # print("Time", t)
             for f in range(self.p["nF"]): self.factory[f].dailyOrderAlloc.append(0)
             for c in range(self.p["nC"]):
-                rand = np.random.rand()
+                u = np.random.rand() if rand is None else rand[t, c]
                 for f in range(self.p["nF"]):
-                    if alloc[f, c] >= rand:
+                    if alloc[f, c] >= u:
                         self.factory[f].dailyOrderAlloc[t] += 1 #count num of orders allocated to each fact
                         # convert order to production hours requried
-                        reqHr = (projDemand[:, c, t] / self.p["pRate"][:, f]).sum()
+                        reqHr = (projDemand[:, c, t] / self.pRate[:, f]).sum()
                         # allocate order
                         self.factory[f].activeOrder.append(obj.Order(c, t, reqHr, f))
-                        # print("Rand Num", round(rand, 2), "; C", c, "with demand:", projDemand[:, c, t],
+                        # print("Rand Num", round(u, 2), "; C", c, "with demand:", projDemand[:, c, t],
                         # "allocated to F", f, "requiring", round(reqHr,2), "production hours")
                         break
             # fulfilment of current demand
             # print()
             for f in range(self.p["nF"]):
-                completedOrder.extend(self.factory[f].produce(t, minPHr[f]))
+                filled = self.factory[f].produce(t, minPHr[f])
+                if sketch is not None: sketch.add(f, [o.cust for o in filled], [o.fulfilmentTime for o in filled])
+                if store is not None: store.addOrders(f, filled)
+                completedOrder.extend(filled)
                 # print()
             # print(len(completedOrder), "order have been completed")
             # print()
+        if store is not None: store.setFactories(self.factory)
         return completedOrder
 
     def computePref(self, completedOrder):
         aveLT, unUtilHr = 0, 0
         # obj 1: average fulfilment lead time
-        aveLT = sum(o.fulfilmentTime for o in completedOrder)/ len(completedOrder)
-        # obj 2: average unutilized cap %
-        unUtilHr = sum(f.unUtilHr for f in self.factory)/ sum(f.totAvailHr for f in self.factory)
+        aveLT = sum(o.fulfilmentTime for o in completedOrder)/ len(completedOrder) if len(completedOrder) > 0 else np.nan
+        # obj 2: average unutilized cap % over the horizon, excluding the hr accumulated before a restored state
+        hr = [f.horizonHr() for f in self.factory]
+        totAvailHr = sum(h[1] for h in hr)
+        unUtilHr = sum(h[0] for h in hr)/ totAvailHr if totAvailHr > 0 else np.nan
 
         return aveLT, unUtilHr
 
-    def computePrefFact(self, completedOrder):
-        unUtilHr, aveLT = {}, {}
-        dailyUnUtilHr, dailyOrderAlloc, dailyOrderFilled, dailyOrderFillTime = {}, {}, {}, {}
-        completedOrderFact = {}
-        for f in range(self.p["nF"]):
-            unUtilHr[f] = self.factory[f].unUtilHr/ self.factory[f].totAvailHr
+    #current state of all factories, see Factory.snapshot
+    def snapshot(self):
+        return [f.snapshot() for f in self.factory]
 
-            completedOrderFact[f] = []
-            for o in completedOrder:
-                if o.fact == f: completedOrderFact[f].append(o)
+    #performance of a replication for each of the selected objectives
+    #percentile objectives are taken from sketch, nan if it is not given
+    def computeObj(self, completedOrder, T, sketch=None):
+        aveLT, unUtilHr = self.computePref(completedOrder)
+        obj = []
+        for o in self.objectives:
+            if o == "aveLT": obj.append(aveLT)
+            elif o == "unUtilHr": obj.append(unUtilHr)
+            elif o == "loadImbalance":
+                #load over the horizon, excluding the hr accumulated before a restored state
+                load = []
+                for f in self.factory:
+                    unUtil, totAvail = f.horizonHr()
+                    load.append((totAvail - unUtil) / (f.maxHr*T))
+                obj.append(np.std(load))
+            elif o in QUANTILE_OBJECTIVES:
+                obj.append(np.nan if sketch is None else self.computeQuantileObj(o, sketch))
 
-            aveLT[f] = sum(o.fulfilmentTime for o in completedOrderFact[f])/ len(completedOrderFact[f])
+        return obj
+
+    def computeQuantileObj(self, o, sketch):
+        q, by = QUANTILE_OBJECTIVES[o]
+        value = sketch.quantile(q, by)
+
+        return value if by is None else np.nanmax(value)
+
+    #factory level performance, see SimResult for the columnar version used by simPlan(store=...)
+    def computePrefFact(self, completedOrder):
+        res = SimResult.fromOrders(completedOrder, self.factory, len(self.factory[0].dailyUnUtilHr))
+        unUtilHr, aveLT = dict(enumerate(res.factUnUtil())), dict(enumerate(res.factAveLT()))
+        dailyUnUtilHr, dailyOrderAlloc, dailyOrderFilled, dailyOrderFillTime = \
+            [dict(enumerate(getattr(res, k).tolist())) for k in DAILY_COLS]
 
-            dailyUnUtilHr[f], dailyOrderAlloc[f], dailyOrderFilled[f], dailyOrderFillTime[f] = [], [], [], []
+        return unUtilHr, aveLT, dailyUnUtilHr, dailyOrderAlloc, dailyOrderFilled, dailyOrderFillTime
 
-            dailyUnUtilHr[f].extend(self.factory[f].dailyUnUtilHr)
-            dailyOrderAlloc[f].extend(self.factory[f].dailyOrderAlloc)
-            dailyOrderFilled[f].extend(self.factory[f].dailyOrderFilled)
-            dailyOrderFillTime[f].extend(self.factory[f].dailyFillTime)
+#random numbers of R replications, returns demand normals (R by nP by nC by T) & allocation uniforms (R by T by nC)
+def sampleScenarios(nP, nC, T, R, sampler="lhs", seed=0):
+    dz, du = nP*nC*T, T*nC
+    if sampler == "mc":
+        rng = np.random.RandomState(seed)
+        z, u = rng.standard_normal((R, dz)), rng.rand(R, du)
+    elif sampler in ["lhs", "sobol"]:
+        from scipy.stats import qmc #loaded on first use, scipy.stats is slow to import
+        from scipy.special import ndtri
+        if sampler == "lhs":
+            U = qmc.LatinHypercube(dz + du, seed=seed).random(R)
+        else:
+            U = qmc.Sobol(dz + du, scramble=True, seed=seed).random_base2(int(np.ceil(np.log2(max(R, 1)))))[:R]
+        z, u = ndtri(U[:, :dz]), U[:, dz:]
+    else:
+        raise ValueError("unknown sampler " + str(sampler))
 
-        return unUtilHr, aveLT, dailyUnUtilHr, dailyOrderAlloc, dailyOrderFilled, dailyOrderFillTime
\ No newline at end of file
+    return z.reshape(R, nP, nC, T), u.reshape(R, T, nC)
@@ -8,6 +8,9 @@ optional input:
 2) T: planning horizon;
 3) factPrefReq: dictates if factory level performace is required
 4) allocRange: if true converts the solution to a min and max range
+5) nGen, popSize: number of generations & population size of the solver
+6) archiveSize: if given, returns up to archiveSize non-dominated sol found over the whole run
+   instead of the non-dominated sol of the final population
 
 output:
 1a) sol, 20 by (num of fact * num of cust + number of fact)
@@ -25,71 +28,91 @@ output:
 import numpy as np
 import model as mop
 import solve as planner
+from resultStore import SimResult
 #
-def plan(param, R=20, T=20, factPrefReq=True, allocRange=True):
+def plan(param, R=20, T=20, factPrefReq=True, allocRange=True, nGen=50, popSize=20, archiveSize=None):
     #initialise the oreder problem
-    problem = mop.AllocProblem(param, R)
-    x, scPerf = planner.runTransferOpt(problem, 50, 20) #gen, pop
+    problem = mop.AllocProblem(param, R, T=T)
+    x, scPerf = planner.runTransferOpt(problem, nGen, popSize, archive=archiveSize is not None,
+                                       archive_size=archiveSize) #gen, pop
     #convert the allocation percentage
-    sol = x.copy()
-    for i in range(x.shape[0]):
-        for c in range(param["nC"]):
-            sol[i, param["nF"]*c : param["nF"]*c + param["nF"]] = \
-                x[i, param["nF"]*c : param["nF"]*c + param["nF"]]\
-                / x[i, param["nF"]*c : param["nF"]*c + param["nF"]].sum()
+    sol = toShare(x, param)
 
-    factPerf = np.empty((x.shape[0], 2*param["nF"]))
+    factPerf = np.full((x.shape[0], 2*param["nF"]), np.nan) #nan if not required
     if (factPrefReq):
         for i in range(x.shape[0]):
             alloc, minPHr = problem.decode(x[i])
             # run for "r" replications
-            aveUnUtilHr, aveLT = {}, {}
-            for f in range(param["nF"]): aveUnUtilHr[f], aveLT[f] = 0, 0
+            aveUnUtilHr, aveLT = np.zeros(param["nF"]), np.zeros(param["nF"])
             for r in range(R):
                 np.random.seed(r)
                 for f in problem.factory: f.reset()
                 projDemand = problem.simDemand(T)  # sample demand from distribution
                 # print()
-                completedOrder = problem.simPlan(projDemand, alloc, minPHr, T)  # simulate planning scenarios
+                res = SimResult(param["nF"], T, T*param["nC"])
+                problem.simPlan(projDemand, alloc, minPHr, T, store=res)  # simulate planning scenarios
                 # compute perf
-                unUtilHr, lt, _, _, _, _ = problem.computePrefFact(completedOrder)
+                aveLT += res.factAveLT()
+                aveUnUtilHr += res.factUnUtil()
 
-                for f in range(param["nF"]):
-                    aveLT[f] += lt[f]
-                    aveUnUtilHr[f] += unUtilHr[f]
+            factPerf[i, 0::2] = aveLT / R
+            factPerf[i, 1::2] = aveUnUtilHr / R
+    if (allocRange): sol = toRange(sol, param)
 
-            for f in range(param["nF"]):
-                factPerf[i, f * 2] = aveLT[f] / R
-                factPerf[i, (f * 2) + 1] = aveUnUtilHr[f] / R
-    if (allocRange):
-        sol_range = np.empty((x.shape[0], 2*param["nF"]*param["nC"]+param["nF"]))
-        for c in range(param["nC"]):
-            for f in range(param["nF"]):
-                idx_range = 2 * (c*param["nF"] + f)
-                idx_sol = c*param["nF"] + f
-                #sol_range[:, idx] - lower bound
-                #sol_range[:, idx+1] - upper bound
-                if f == 0:
-                    sol_range[:, idx_range] = 0
-                    sol_range[:, idx_range+1] = sol[:, idx_sol]
-                else:
-                    sol_range[:, idx_range] = sol_range[:, idx_range-1]
-                    sol_range[:, idx_range + 1] = sol[:, idx_sol] + sol_range[:, idx_range-1]
-        sol_range[:, 2*param["nF"]*param["nC"]: 2*param["nF"]*param["nC"]+param["nF"]] = sol[:, param["nF"]*param["nC"]:]
-        sol = sol_range.copy()
-
-        unutilCapPref, perfCat = np.linspace(0, 1, num=x.shape[0]), np.empty(x.shape[0])
-        sortIdx = np.argsort(np.argsort(-scPerf[:,1]))
-        unutilCapPref = unutilCapPref[sortIdx]
-
-        binSize = 4/ (x.shape[0]-1) #4 categories
-        for i in range(x.shape[0]):
-            if unutilCapPref[i] <= binSize: perfCat[i] = 0 # Short Order Fulfilment Time with Higher Unutilized Production Capacity
-            elif unutilCapPref[i] <= 2*binSize: perfCat[i] = 1 # Mid Order Fulfilment Time with Slightly Higher Unutilized Production Capacity
-            elif unutilCapPref[i] <= 3*binSize: perfCat[i] = 2 # Mid Unutilized Production Capacity with Slightly Longer Order Fulfilment Time
-            else: perfCat[i] = 3 # Low Unutilized Production Capacity with Longer Order Fulfilment Time
+    unutilCapPref = np.linspace(0, 1, num=x.shape[0])
+    sortIdx = np.argsort(np.argsort(-scPerf[:,1]))
+    unutilCapPref = unutilCapPref[sortIdx]
+    perfCat = categorise(unutilCapPref, x.shape[0])
 
     return sol, scPerf, factPerf, unutilCapPref, perfCat
+
+#convert the decision variables to allocation percentage of each customer, sol by (nF*nC + nF)
+def toShare(x, param):
+    sol = x.copy()
+    for i in range(x.shape[0]):
+        for c in range(param["nC"]):
+            sol[i, param["nF"]*c : param["nF"]*c + param["nF"]] = \
+                x[i, param["nF"]*c : param["nF"]*c + param["nF"]]\
+                / x[i, param["nF"]*c : param["nF"]*c + param["nF"]].sum()
+
+    return sol
+
+#convert the allocation percentage to a min & max range, sol by (2*nF*nC + nF)
+def toRange(sol, param):
+    sol_range = np.empty((sol.shape[0], 2*param["nF"]*param["nC"]+param["nF"]))
+    for c in range(param["nC"]):
+        for f in range(param["nF"]):
+            idx_range = 2 * (c*param["nF"] + f)
+            idx_sol = c*param["nF"] + f
+            #sol_range[:, idx] - lower bound
+            #sol_range[:, idx+1] - upper bound
+            if f == 0:
+                sol_range[:, idx_range] = 0
+                sol_range[:, idx_range+1] = sol[:, idx_sol]
+            else:
+                sol_range[:, idx_range] = sol_range[:, idx_range-1]
+                sol_range[:, idx_range + 1] = sol[:, idx_sol] + sol_range[:, idx_range-1]
+    sol_range[:, 2*param["nF"]*param["nC"]: 2*param["nF"]*param["nC"]+param["nF"]] = sol[:, param["nF"]*param["nC"]:]
+
+    return sol_range
+
+#inverse of toRange, back to allocation percentage (valid decision variables)
+def fromRange(sol_range, param):
+    nFC = param["nF"]*param["nC"]
+
+    return np.hstack([sol_range[:, 1:2*nFC:2] - sol_range[:, 0:2*nFC:2], sol_range[:, 2*nFC:]])
+
+#categorise the preference value of a front of n sol into the 4 categories
+def categorise(unutilCapPref, n):
+    perfCat = np.empty(len(unutilCapPref))
+    binSize = 4/ (n-1) if n > 1 else 1 #4 categories, a single sol falls in category 0
+    for i in range(len(unutilCapPref)):
+        if unutilCapPref[i] <= binSize: perfCat[i] = 0 # Short Order Fulfilment Time with Higher Unutilized Production Capacity
+        elif unutilCapPref[i] <= 2*binSize: perfCat[i] = 1 # Mid Order Fulfilment Time with Slightly Higher Unutilized Production Capacity
+        elif unutilCapPref[i] <= 3*binSize: perfCat[i] = 2 # Mid Unutilized Production Capacity with Slightly Longer Order Fulfilment Time
+        else: perfCat[i] = 3 # Low Unutilized Production Capacity with Longer Order Fulfilment Time
+
+    return perfCat
 '''
 #setting up problem parameters
 nFact, nCust, nPrdt = 3, 3, 2
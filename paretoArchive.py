@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+- Helper class to trNSGA2
+- External archive of all non-dominated solutions evaluated during a run (unbounded)
+    - 2 objectives: front kept sorted on obj 1 (obj 2 is then decreasing), dominance check by bisection,
+      insertion by list splicing (O(n) moves, fast in practice as it is a memmove)
+    - more objectives: vectorised dominance check against the whole archive
+- Pruning to a requested size based on crowding distance or hypervolume contribution (2 objectives)
+    - 2 objectives: contributions kept in a heap, only the 2 neighbours of a removed sol are updated, O(n log n)
+@author: cstan
+"""
+
+import bisect
+import heapq
+import numpy as np
+
+class ParetoArchive():
+    def __init__(self, nObj=2):
+        self.nObj = nObj
+        self.sol, self.obj = [], [] #sorted on obj 1 for 2 objectives
+        self.f1, self.f2 = [], [] #bisection keys for 2 objectives
+
+    def __len__(self):
+        return len(self.sol)
+
+    #add a sol to the archive, return True if it is non-dominated
+    def add(self, x, f):
+        f = [float(v) for v in f]
+        if self.nObj == 2: return self._add2D(list(x), f)
+
+        if len(self.obj) > 0:
+            obj = np.array(self.obj)
+            if np.any(np.all(obj <= f, axis=1)): return False #dominated by or identical to an archived sol
+            keep = ~(np.all(obj >= f, axis=1) & np.any(obj > f, axis=1))
+            self.sol = [s for s, k in zip(self.sol, keep) if k]
+            self.obj = [o for o, k in zip(self.obj, keep) if k]
+        self.sol.append(list(x))
+        self.obj.append(f)
+
+        return True
+
+    def _add2D(self, x, f):
+        pos = bisect.bisect_left(self.f1, f[0])
+        #only the sol just before pos (smallest obj 2 among those with a smaller obj 1) can dominate it
+        if pos > 0 and self.f2[pos - 1] <= f[1]: return False
+        if pos < len(self.f1) and self.f1[pos] == f[0] and self.f2[pos] <= f[1]: return False
+        #sol dominated by the new sol are contiguous from pos as obj 2 decreases along the front
+        end = pos
+        while end < len(self.f2) and self.f2[end] >= f[1]:
+            end += 1
+        self.sol[pos:end], self.obj[pos:end] = [x], [f]
+        self.f1[pos:end], self.f2[pos:end] = [f[0]], [f[1]]
+
+        return True
+
+    #archived sol & obj values, pruned to size if it is given
+    def get(self, size=None, method="crowding"):
+        if size is not None: self.prune(size, method)
+
+        return np.array(self.sol), np.array(self.obj)
+
+    #remove the most crowded/ least hypervolume contributing sol one at a time till the archive has size sol
+    def prune(self, size, method="crowding"):
+        if method not in ["crowding", "hv"]:
+            raise ValueError("unknown pruning method " + method)
+        if method == "hv" and self.nObj != 2:
+            raise ValueError("hypervolume contribution pruning is only available for 2 objectives")
+        if self.nObj == 2: return self._prune2D(size, method)
+        while len(self.sol) > size:
+            obj = np.array(self.obj)
+            contrib = crowding_distance(obj) if method == "crowding" else hv_contribution(obj)
+            i = int(np.argmin(contrib))
+            del self.sol[i], self.obj[i]
+
+    #same removal order as recomputing the contributions after every removal, ties removed in front order
+    def _prune2D(self, size, method):
+        n = len(self.sol)
+        if n <= size: return
+        f1, f2 = self.f1, self.f2
+        prev, next = list(range(-1, n - 1)), list(range(1, n + 1)) #linked list of the remaining sol
+        span1, span2 = f1[-1] - f1[0], f2[0] - f2[-1] #extreme sol are never removed before the interior ones
+
+        def contrib(i):
+            p, q = prev[i], next[i]
+            if p < 0 or q >= n: return np.inf
+            if method == "hv": return (f1[q] - f1[i]) * (f2[p] - f2[i])
+            d = 0.0
+            if span1 > 0: d += (f1[q] - f1[p]) / span1
+            if span2 > 0: d += (f2[p] - f2[q]) / span2
+            return d
+
+        value = [contrib(i) for i in range(n)]
+        heap = [(v, i) for i, v in enumerate(value)]
+        heapq.heapify(heap)
+        removed = [False] * n
+        remain = n
+        while remain > size:
+            v, i = heapq.heappop(heap)
+            if removed[i] or v != value[i]: continue #stale entry
+            removed[i] = True
+            remain -= 1
+            p, q = prev[i], next[i]
+            if p >= 0: next[p] = q
+            if q < n: prev[q] = p
+            for j in [p, q]:
+                if 0 <= j < n and remain > 2:
+                    value[j] = contrib(j)
+                    heapq.heappush(heap, (value[j], j))
+
+        keep = [i for i in range(n) if not removed[i]]
+        self.sol, self.obj = [self.sol[i] for i in keep], [self.obj[i] for i in keep]
+        self.f1, self.f2 = [f1[i] for i in keep], [f2[i] for i in keep]
+
+    def getState(self):
+        return {"sol": np.array(self.sol, dtype=float), "obj": np.array(self.obj, dtype=float).reshape(-1, self.nObj)}
+
+    def setState(self, state):
+        self.sol, self.obj = state["sol"].tolist(), state["obj"].tolist()
+        if self.nObj == 2:
+            self.f1, self.f2 = [o[0] for o in self.obj], [o[1] for o in self.obj]
+
+#crowding distance of a set of non-dominated obj values (n by nObj), boundary sol have infinite distance
+def crowding_distance(obj):
+    n = obj.shape[0]
+    distance = np.zeros(n)
+    if n <= 2: return np.full(n, np.inf)
+    for m in range(obj.shape[1]):
+        order = np.argsort(obj[:, m], kind="stable")
+        f = obj[order, m]
+        span = f[-1] - f[0]
+        distance[order[[0, -1]]] = np.inf
+        if span > 0: distance[order[1:-1]] += (f[2:] - f[:-2]) / span
+
+    return distance
+
+#exclusive hypervolume contribution of a 2 obj front, the extreme sol are always kept
+def hv_contribution(obj):
+    n = obj.shape[0]
+    if n <= 2: return np.full(n, np.inf)
+    order = np.argsort(obj[:, 0], kind="stable")
+    f1, f2 = obj[order, 0], obj[order, 1]
+    contrib = np.full(n, np.inf)
+    contrib[order[1:-1]] = (f1[2:] - f1[1:-1]) * (f2[:-2] - f2[1:-1])
+
+    return contrib
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+- Helper class to model
+- Columnar store of the output of a simulation (one replication)
+    - completed orders as NumPy columns: fact, cust, arrival & fulfilment time
+    - daily factory performance as nF by T matrices: unutilised hr %, orders allocated, orders filled, ave fill time
+    - unutilised & available hr per factory over the simulated horizon
+- Per-factory aggregates by grouped reductions, export to/ import from npz
+@author: cstan
+"""
+
+import numpy as np
+
+ORDER_COLS = ["fact", "cust", "arrival", "fulfilment"]
+DAILY_COLS = ["dailyUnUtilHr", "dailyOrderAlloc", "dailyOrderFilled", "dailyFillTime"]
+
+class SimResult():
+    def __init__(self, nF, T, capacity=64):
+        self.nF, self.T, self.n = nF, T, 0
+        self.fact, self.cust = np.zeros(capacity, dtype=int), np.zeros(capacity, dtype=int)
+        self.arrival, self.fulfilment = np.zeros(capacity), np.zeros(capacity)
+        for k in DAILY_COLS: setattr(self, k, np.zeros((nF, T)))
+        self.unUtilHr, self.totAvailHr = np.zeros(nF), np.zeros(nF)
+
+    def _grow(self, size):
+        capacity = max(size, 2*self.fact.shape[0])
+        for k in ORDER_COLS:
+            col = getattr(self, k)
+            new = np.zeros(capacity, dtype=col.dtype)
+            new[:self.n] = col[:self.n]
+            setattr(self, k, new)
+
+    #append completed orders of fact f, or of the fact of each order if f is None
+    def addOrders(self, f, orders):
+        m = len(orders)
+        if m == 0: return
+        if self.n + m > self.fact.shape[0]: self._grow(self.n + m)
+        self.fact[self.n:self.n + m] = [o.fact for o in orders] if f is None else f
+        self.cust[self.n:self.n + m] = [o.cust for o in orders]
+        self.arrival[self.n:self.n + m] = [o.arrivalTime for o in orders]
+        self.fulfilment[self.n:self.n + m] = [o.fulfilmentTime for o in orders]
+        self.n += m
+
+    #copy the daily records & hr counters of the factories at the end of the simulation
+    def setFactories(self, factory):
+        for f in factory:
+            for k in DAILY_COLS:
+                daily = np.asarray(getattr(f, k), dtype=float)[:self.T]
+                getattr(self, k)[f.id, :daily.shape[0]] = daily
+            self.unUtilHr[f.id], self.totAvailHr[f.id] = f.horizonHr()
+
+    @classmethod
+    def fromOrders(cls, completedOrder, factory, T):
+        res = cls(len(factory), T, max(len(completedOrder), 1))
+        res.addOrders(None, completedOrder)
+        res.setFactories(factory)
+
+        return res
+
+    def orders(self):
+        return {k: getattr(self, k)[:self.n] for k in ORDER_COLS}
+
+    #num of completed orders per factory
+    def factCount(self):
+        return np.bincount(self.fact[:self.n], minlength=self.nF)
+
+    #average fulfilment time per factory, nan for a factory without completed order
+    def factAveLT(self):
+        n = self.factCount()
+        total = np.bincount(self.fact[:self.n], weights=self.fulfilment[:self.n], minlength=self.nF)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, total / n, np.nan)
+
+    #unutilised hr % per factory, nan for a factory that never produced
+    def factUnUtil(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.totAvailHr > 0, self.unUtilHr / self.totAvailHr, np.nan)
+
+    def save(self, path):
+        np.savez(path, nF=self.nF, T=self.T, unUtilHr=self.unUtilHr, totAvailHr=self.totAvailHr,
+                 **self.orders(), **{k: getattr(self, k) for k in DAILY_COLS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            res = cls(int(data["nF"]), int(data["T"]), max(data["fact"].shape[0], 1))
+            res.n = data["fact"].shape[0]
+            for k in ORDER_COLS: getattr(res, k)[:res.n] = data[k]
+            for k in DAILY_COLS + ["unUtilHr", "totAvailHr"]: setattr(res, k, data[k])
+
+        return res
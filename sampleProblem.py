@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Sample problem parameters (3 factories, 3 customers, 2 products) shared by main.py & the benchmark scripts
+@author: cstan
+"""
+
+import numpy as np
+
+def sampleParam():
+    #setting up problem parameters
+    nFact, nCust, nPrdt = 3, 3, 2
+    tLT = np.ones((nFact, nCust))
+    tLT[0, 1], tLT[1, 0], tLT[2, 1], tLT[1, 2] = 2, 2, 2, 2
+    tLT[0, 2], tLT[2, 0] = 3, 3
+
+    #maxHr: avialable hours per day for each factory
+    #pRate: production rate (qty/ hr) for each product per factory (nPrdt x nFact)
+    #aveD: average demand for each product per customer (nPrdt x nCust)
+    return {"nF": nFact, "nC": nCust, "nP": nPrdt,
+            "tLT": tLT, "maxHr": np.array([10, 10, 10]),
+            "pRate": np.array([[15.6, 5.2, 15.6], [10.4, 10.4, 5.2]]),
+            "aveD": np.array([[60, 20, 30], [40, 40, 10]]),
+            #"devD": np.array([[0.2, 0.2, 0.2], [0.2, 0.2, 0.2]])}
+            "devD": np.array([[0.3, 0.2, 0.2], [0.1, 0.1, 0.1]])}
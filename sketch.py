@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+- Helper class to model
+- Mergeable, fixed-size quantile sketch of the order fulfilment time for each factory & customer
+    - fixed-bin histogram (bin width binWidth from lo) with an overflow bin, exact count, sum & max
+    - sketches of different replications/ workers are merged by adding their counts
+    - quantiles per factory, per customer or overall, within binWidth of the exact value
+@author: cstan
+"""
+
+import numpy as np
+
+class QuantileSketch():
+    #lo = -0.5 & binWidth = 1 centres the bins on the integer fulfilment times
+    def __init__(self, nF, nC, nBins=128, binWidth=1.0, lo=-0.5):
+        self.nBins, self.binWidth, self.lo = nBins, binWidth, lo
+        self.counts = np.zeros((nF, nC, nBins + 1), dtype=np.int64) #last bin is the overflow bin
+        self.sum = np.zeros((nF, nC))
+        self.max = np.full((nF, nC), -np.inf)
+
+    #add values of fact f for customers cust
+    def add(self, f, cust, values):
+        cust, values = np.asarray(cust, dtype=int), np.asarray(values, dtype=float)
+        if values.size == 0: return
+        idx = np.clip(((values - self.lo) // self.binWidth).astype(int), 0, self.nBins)
+        np.add.at(self.counts[f], (cust, idx), 1)
+        np.add.at(self.sum[f], cust, values)
+        np.maximum.at(self.max[f], cust, values)
+
+    def merge(self, other):
+        if self.counts.shape != other.counts.shape or self.binWidth != other.binWidth or self.lo != other.lo:
+            raise ValueError("sketches with different bins cannot be merged")
+        self.counts += other.counts
+        self.sum += other.sum
+        self.max = np.maximum(self.max, other.max)
+
+        return self
+
+    def reset(self):
+        self.counts[:] = 0
+        self.sum[:] = 0
+        self.max[:] = -np.inf
+
+    #counts, sum & max grouped by "fact", "cust" or None (overall)
+    def _group(self, by):
+        if by == "fact": return self.counts.sum(axis=1), self.sum.sum(axis=1), self.max.max(axis=1)
+        if by == "cust": return self.counts.sum(axis=0), self.sum.sum(axis=0), self.max.max(axis=0)
+        if by is None: return self.counts.sum(axis=(0, 1))[None], self.sum.sum()[None], self.max.max()[None]
+        raise ValueError("unknown grouping " + str(by))
+
+    def count(self, by=None):
+        counts, _, _ = self._group(by)
+
+        return counts.sum(axis=-1) if by is not None else counts.sum()
+
+    def mean(self, by=None):
+        counts, total, _ = self._group(by)
+        n = counts.sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m = np.where(n > 0, total / n, np.nan)
+
+        return m if by is not None else m[0]
+
+    #q-th quantile (0 to 1), linear interpolation within the bin, nan for a group without any value
+    def quantile(self, q, by=None):
+        counts, _, vmax = self._group(by)
+        n = counts.sum(axis=-1)
+        cum = np.cumsum(counts, axis=-1)
+        target = q * n
+        i = np.minimum(np.argmax(cum >= target[:, None], axis=-1), self.nBins)
+        rows = np.arange(counts.shape[0])
+        before = np.where(i > 0, cum[rows, np.maximum(i - 1, 0)], 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.where(counts[rows, i] > 0, (target - before) / counts[rows, i], 0)
+        value = self.lo + self.binWidth * (i + frac)
+        #values in the overflow bin are only known to lie below the max
+        value = np.where(i == self.nBins, vmax, np.minimum(value, vmax))
+        value = np.where(n > 0, value, np.nan)
+
+        return value if by is not None else value[0]
@@ -3,54 +3,86 @@
 Interface to run various multi-objective optimization algorithms
 - runTransferOpt, calls the trNSGA2 with source transfer
 - runOpt, calls the trNSGA2 without source transfer, similar to NSGA2
+- runAsyncTransferOpt, calls the asynchronous steady-state ssNSGA2 with source transfer
 - runNSGAII, calls NSGA2 in pymoo
 
 @author: cstan
 """
 
 import numpy as np
-from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
 
 import trNSGA2 as trOpt
+import ssNSGA2 as ssOpt
 import guassMixtureModel as gmm
-from pymoo.optimize import minimize
-from pymoo.algorithms.moo.nsga2 import NSGA2
+import paretoArchive as pa
+from MOEA_operators import non_dominated_rank
 
-#use transfer optimization solver with human prior
-def runTransferOpt(problem, num_gen=100, pop_size=100):
+#source task/ human prior, single customer to factory allocation based on nearest distance
+def humanPrior(problem):
     nVar = problem.p["nF"] * problem.p["nC"] + problem.p["nF"]
-    solver = None
-    #setup source task/ human prior
-    srcCov = np.diag(np.ones(problem.p["nF"] * problem.p["nC"]) * 0.1)
+    srcVar = np.ones(problem.p["nF"] * problem.p["nC"]) * 0.1 #diagonal covariance
     srcMean = np.zeros(problem.p["nF"] * problem.p["nC"])
-    #single customer to factory allocation based on nearest distance
     for c in range(problem.p["nC"]):
         idxF = np.argmin(problem.p["tLT"][:,c])
         srcMean[problem.p["nF"] * c + idxF] = 1
     srcModel = gmm.GuassModel()
-    srcModel.build_from_param(srcMean, srcCov)
+    srcModel.build_from_param(srcMean, srcVar)
     srcModel.mod_dim(nVar)
-    mm = gmm.GuassMixtureModel([srcModel])
 
-    solver_trf = trOpt.trNSGA2(problem, num_gen, pop_size, nVar, mixture_model=mm, tr_int=2)
+    return gmm.GuassMixtureModel([srcModel], dtype=problem.fdt)
+
+#use transfer optimization solver with human prior
+#archive: if true returns the non-dominated sol among all evaluated sol instead of the final pop,
+#pruned to archive_size sol (None: unbounded) with archive_prune ("crowding" or "hv")
+def runTransferOpt(problem, num_gen=100, pop_size=100, checkpoint=None, checkpoint_int=10,
+                   archive=False, archive_size=None, archive_prune="crowding"):
+    nVar = problem.p["nF"] * problem.p["nC"] + problem.p["nF"]
+    mm = humanPrior(problem)
+    ar = pa.ParetoArchive(problem.n_obj) if archive else None
+
+    solver_trf = trOpt.trNSGA2(problem, num_gen, pop_size, nVar, mixture_model=mm, tr_int=2,
+                               checkpoint=checkpoint, checkpoint_int=checkpoint_int, archive=ar)
+    if archive: return ar.get(archive_size, archive_prune)
     #get Pareto solution & its obj values
-    sol, obj = np.array(solver_trf.sol), np.vstack([solver_trf.obj1, solver_trf.obj2]).T
-    p_idx = NonDominatedSorting().do(obj, only_non_dominated_front=True)
+    sol, obj = np.array(solver_trf.sol), np.array(solver_trf.obj)
+    p_idx = np.flatnonzero(non_dominated_rank(obj) == 0)
 
     return sol[p_idx], obj[p_idx]
 
-def runOpt(problem, num_gen=100, pop_size=100):
+def runOpt(problem, num_gen=100, pop_size=100, checkpoint=None, checkpoint_int=10,
+           archive=False, archive_size=None, archive_prune="crowding"):
     nVar = problem.p["nF"] * problem.p["nC"] + problem.p["nF"]
-    solver_noTrf = trOpt.trNSGA2(problem, num_gen, pop_size, nVar, mixture_model=None, tr_int=None)
+    ar = pa.ParetoArchive(problem.n_obj) if archive else None
+    solver_noTrf = trOpt.trNSGA2(problem, num_gen, pop_size, nVar, mixture_model=None, tr_int=None,
+                                 checkpoint=checkpoint, checkpoint_int=checkpoint_int, archive=ar)
+    if archive: return ar.get(archive_size, archive_prune)
     #get Pareto solution & its obj values
-    sol, obj = np.array(solver_noTrf.sol), np.vstack([solver_noTrf.obj1, solver_noTrf.obj2]).T
-    p_idx = NonDominatedSorting().do(obj, only_non_dominated_front=True)
+    sol, obj = np.array(solver_noTrf.sol), np.array(solver_noTrf.obj)
+    p_idx = np.flatnonzero(non_dominated_rank(obj) == 0)
 
     return sol[p_idx], obj[p_idx]
 
 
+#use asynchronous steady-state transfer optimization solver with human prior, num_eval evaluations in total
+def runAsyncTransferOpt(problem, num_eval=10000, pop_size=100, n_workers=None,
+                        archive=False, archive_size=None, archive_prune="crowding"):
+    nVar = problem.p["nF"] * problem.p["nC"] + problem.p["nF"]
+    ar = pa.ParetoArchive(problem.n_obj) if archive else None
+    solver_ss = ssOpt.ssNSGA2(problem, num_eval, pop_size, nVar, mixture_model=humanPrior(problem), tr_int=2,
+                              n_workers=n_workers, archive=ar)
+    if archive: return ar.get(archive_size, archive_prune)
+    #get Pareto solution & its obj values
+    sol, obj = np.array(solver_ss.sol), np.array(solver_ss.obj)
+    p_idx = np.flatnonzero(non_dominated_rank(obj) == 0)
+
+    return sol[p_idx], obj[p_idx]
+
 #use plain vanilla NSGA2 solver from pymoo
 def runNSGAII(problem, num_gen=100, pop_size=100):
+    #pymoo solver is only loaded on this path to keep the import of the planner light
+    from pymoo.optimize import minimize
+    from pymoo.algorithms.moo.nsga2 import NSGA2
+
     solver = NSGA2(pop_size=pop_size)
     result = minimize(problem, solver, ('n_gen', num_gen), seed=1, verbose=False)
 
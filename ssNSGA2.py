@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous steady-state variant of trNSGA2
+- a new offspring is submitted as soon as a worker is free, no generational barrier
+- each finished evaluation is inserted into the population, the dominance matrix of the population is updated
+  incrementally & the worst sol (last front, most crowded/ least needed by the reference directions) is removed
+- mixture model transfer is triggered by evaluation count, pop_size transfer samples every tr_int*pop_size evaluations,
+  the same share as a transfer generation every tr_int generations of trNSGA2
+- with n_workers > 1 the completion order of the evaluations depends on timing, runs are not reproducible
+
+@author: cstan
+"""
+
+import os
+import time
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from MOEA_operators import SBX_crossover, polynomial_mutation, check_bounds, binary_tournament_rank, \
+    dominance_matrix, rank_from_dominance, reference_directions, num_partitions, reference_direction_selection, \
+    constraint_penalty
+from paretoArchive import crowding_distance
+
+#problem of the worker process, sent once when the worker starts
+_problem = {}
+
+def _initWorker(problem):
+    _problem["problem"] = problem
+
+def _evaluate(x):
+    start = time.perf_counter()
+    problem = _problem["problem"]
+    F, G = problem.evaluate(np.array(x, dtype=getattr(problem, "fdt", np.float64)), return_values_of=["F", "G"])
+
+    return [float(v) for v in constraint_penalty(F, G)], time.perf_counter() - start
+
+class ssNSGA2():
+    #max_eval: num of evaluations, including the initial pop
+    #n_workers: num of worker processes, 1 evaluates in the current process
+    def __init__(self, problem, max_eval, pop_size, nVar, mixture_model=None, tr_int=2, seed=1, n_workers=None,
+                 archive=None):
+        random.seed(seed)
+        self.problem = problem
+        self.dtype = getattr(problem, "fdt", np.float64) #precision of the pop arrays, see model.PRECISIONS
+        self.n_obj = problem.n_obj
+        self.pop_size, self.nVar = pop_size, nVar
+
+        self.n_eval = 0
+        self.sol = []
+        self.obj = [] #obj values of the pop, pop_size by n_obj
+        self.dom = np.zeros((0, 0), dtype=bool) #dominance matrix of the pop
+        self.ref_dirs = None
+        if self.n_obj > 2: self.ref_dirs = reference_directions(self.n_obj, num_partitions(self.n_obj, pop_size))
+
+        self.mixture_model = mixture_model
+        self.tr_int = tr_int
+        self.archive = archive
+        self.queue = [] #offspring waiting to be submitted, e.g. transfer samples & 2nd child of crossover
+
+        self.busy_time, self.wall_time, self.utilisation = 0, 0, 0
+
+        self.run(max_eval, n_workers)
+
+    def run(self, max_eval, n_workers):
+        start = time.perf_counter()
+        n_workers = n_workers or os.cpu_count() or 1
+        if n_workers == 1:
+            _initWorker(self.problem)
+            for _ in range(max_eval):
+                x = self.offspring()
+                obj, busy = _evaluate(x)
+                self.insert(x, obj, busy)
+        else:
+            with ProcessPoolExecutor(n_workers, initializer=_initWorker, initargs=(self.problem,)) as pool:
+                pending, submitted = {}, 0
+                while self.n_eval < max_eval:
+                    #keep every worker busy
+                    while len(pending) < n_workers and submitted < max_eval:
+                        x = self.offspring()
+                        pending[pool.submit(_evaluate, x)] = x
+                        submitted += 1
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        obj, busy = fut.result()
+                        self.insert(pending.pop(fut), obj, busy)
+        self.wall_time = time.perf_counter() - start
+        self.utilisation = self.busy_time / (self.wall_time * n_workers)
+
+    #next sol to evaluate
+    def offspring(self):
+        if len(self.queue) > 0: return self.queue.pop(0)
+        #initial random solution till the pop is filled
+        if len(self.sol) < self.pop_size: return [random.random() for _ in range(self.nVar)]
+
+        rank = rank_from_dominance(self.dom)
+        n = len(self.sol)
+        a = binary_tournament_rank(random.randint(0, n - 1), random.randint(0, n - 1), rank)
+        b = binary_tournament_rank(random.randint(0, n - 1), random.randint(0, n - 1), rank)
+        c1, c2 = SBX_crossover(self.sol[a], self.sol[b])
+        c1_mutated, c2_mutated = polynomial_mutation(c1, c2)
+        self.queue.append(c2_mutated)
+
+        return c1_mutated
+
+    #add an evaluated sol to the pop & remove the worst sol if the pop is full
+    def insert(self, x, obj, busy=0):
+        self.n_eval += 1
+        self.busy_time += busy
+        if self.archive is not None: self.archive.add(x, obj)
+
+        #incremental update of the dominance matrix, new row & col against the current pop
+        n = len(self.sol)
+        dom = np.zeros((n + 1, n + 1), dtype=bool)
+        dom[:n, :n] = self.dom
+        if n > 0:
+            dom[n, :n] = dominance_matrix([obj], self.obj)[0]
+            dom[:n, n] = dominance_matrix(self.obj, [obj])[:, 0]
+        self.sol.append(x)
+        self.obj.append(obj)
+        self.dom = dom
+
+        if len(self.sol) > self.pop_size:
+            worst = self.worst()
+            del self.sol[worst], self.obj[worst]
+            self.dom = np.delete(np.delete(self.dom, worst, axis=0), worst, axis=1)
+
+        #transfer by evaluation count
+        if self.mixture_model is not None and self.tr_int is not None and len(self.sol) == self.pop_size \
+                and self.n_eval % (self.tr_int * self.pop_size) == 0:
+            self.mixture_model.update(np.array(self.sol, dtype=self.dtype))
+            for s in self.mixture_model.sample(self.pop_size):
+                self.queue.append(check_bounds(s.tolist()))
+
+    #index of the sol to be removed from a pop of pop_size + 1
+    def worst(self):
+        rank = rank_from_dominance(self.dom)
+        F = np.array(self.obj)
+        if self.n_obj > 2:
+            keep = reference_direction_selection(F, self.pop_size, self.ref_dirs, rank)
+            return int(np.setdiff1d(np.arange(F.shape[0]), keep)[0])
+        last = np.flatnonzero(rank == rank.max())
+        distance = crowding_distance(F[last])
+
+        return int(last[np.argmin(distance)])
+
+    @property
+    def obj1(self):
+        return [o[0] for o in self.obj]
+
+    @property
+    def obj2(self):
+        return [o[1] for o in self.obj]
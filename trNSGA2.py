@@ -7,59 +7,81 @@ Algorithm for transfer optimization based on NSGA2 and, -
 @author: cstan
 """
 
+import os
+import hashlib
 import numpy as np
 import random
 from MOEA_operators import SBX_crossover, polynomial_mutation, binary_tournament, crowding_distance, \
-    sort_distance, fast_non_dominated_sort, check_bounds
+    sort_distance, fast_non_dominated_sort, check_bounds, binary_tournament_rank, non_dominated_rank, \
+    reference_directions, num_partitions, reference_direction_selection, constraint_penalty
 
 class trNSGA2():
-    def __init__(self, problem, max_gen, pop_size, nVar, mixture_model=None, tr_int=2, seed=1):
+    #checkpoint: file to save the run state every checkpoint_int generations, the run resumes from it if it exists
+    #archive: external archive (ParetoArchive) that every evaluated sol passes through
+    #selection: "crowding" (NSGA2, 2 obj) or "reference" (reference directions, NSGA-III), default based on num of obj
+    #n_partitions: divisions per obj of the reference directions, default gives at most pop_size directions
+    def __init__(self, problem, max_gen, pop_size, nVar, mixture_model=None, tr_int=2, seed=1,
+                 checkpoint=None, checkpoint_int=10, archive=None, selection=None, n_partitions=None):
         random.seed(seed)
         self.problem = problem
+        self.dtype = getattr(problem, "fdt", np.float64) #precision of the pop arrays, see model.PRECISIONS
+        self.n_obj = problem.n_obj
         
         self.gen_no = 0
         self.sol = []
-        self.obj1, self.obj2 = [], []
+        self.obj = [] #obj values of the pop, pop_size by n_obj
+
+        self.selection = selection if selection is not None else ("crowding" if self.n_obj == 2 else "reference")
+        if self.selection == "crowding" and self.n_obj != 2:
+            raise ValueError("crowding distance selection is only available for 2 objectives")
+        self.ref_dirs = None
+        if self.selection == "reference":
+            if n_partitions is None: n_partitions = num_partitions(self.n_obj, pop_size)
+            self.ref_dirs = reference_directions(self.n_obj, n_partitions)
     
         self.mixture_model = mixture_model
         self.pop_mean = []
         self.pop_var = []
+        self.archive = archive
+
+        self.checkpoint, self.checkpoint_int = checkpoint, checkpoint_int
+        self.key = self.settings_key(pop_size, nVar, tr_int, seed)
+        resume = checkpoint is not None and os.path.exists(checkpoint)
+        if resume: self.load_checkpoint(checkpoint, pop_size, nVar)
         
-        self.run(max_gen, pop_size, nVar, tr_int)
-        
-    def run(self, max_gen, pop_size, nVar, tr_int):
-        self.gen_no = 0
-        #initial random solution
-        self.sol = [[random.random() for _ in range(nVar)] for _ in range(0, pop_size)]
-        #initial random solution with 1 optimal sol here
-        #self.sol = [[random.random() for _ in range(nVar)] for _ in range(0, pop_size-1)]
-        #opt1 = [0.955514, 0, 0, 0, 0.80494, 0, 0, 0, 0.865341, 0.921572, 0.837982, 0.727248]        
-        #self.sol.append(opt1)
-        self.obj1, self.obj2 = [], []
-        for i in range(pop_size):
-            obj = self.problem.evaluate(np.array(self.sol[i]))
-            self.obj1.append(obj[0]) 
-            self.obj2.append(obj[1])
+        self.run(max_gen, pop_size, nVar, tr_int, resume)
         
-        curr_sol = np.array(self.sol)
-        self.pop_mean.append(np.mean(curr_sol, axis=0))
-        self.pop_var.append(np.diag(np.cov(curr_sol.T)))
+    def run(self, max_gen, pop_size, nVar, tr_int, resume=False):
+        if not resume:
+            self.gen_no = 0
+            #initial random solution
+            self.sol = [[random.random() for _ in range(nVar)] for _ in range(0, pop_size)]
+            #initial random solution with 1 optimal sol here
+            #self.sol = [[random.random() for _ in range(nVar)] for _ in range(0, pop_size-1)]
+            #opt1 = [0.955514, 0, 0, 0, 0.80494, 0, 0, 0, 0.865341, 0.921572, 0.837982, 0.727248]
+            #self.sol.append(opt1)
+            self.obj = []
+            for i in range(pop_size):
+                self.obj.append(self.evaluate(self.sol[i]))
+
+            curr_sol = np.array(self.sol, dtype=self.dtype)
+            self.pop_mean.append(np.mean(curr_sol, axis=0))
+            self.pop_var.append(np.diag(np.cov(curr_sol.T)))
+            if self.checkpoint is not None: self.save_checkpoint(self.checkpoint)
         while (self.gen_no < max_gen):
-            non_dominated_sorted_solution = fast_non_dominated_sort(self.obj1[:], self.obj2[:])
             #print("AMTEA Output for Generation ", self.gen_no, " :")
-            parent_front_f11 = []
-            parent_front_f22 = []
-            non_dominated_sorted_solution[0].sort()
-            for index in non_dominated_sorted_solution[0]:
-                parent_front_f11.append(self.obj1[index])
-                parent_front_f22.append(self.obj2[index])
+            obj1, obj2, rank = None, None, None
+            if self.n_obj == 2:
+                obj1, obj2 = self.obj1, self.obj2
+            else:
+                rank = non_dominated_rank(self.obj)
                 
             # Generating offsprings
             solution2 = self.sol[:]
             while (len(solution2) < 2 * pop_size):
                 # offspring generated by sampling the target probabilistic mixture model at specified transfer intervals
                 if (tr_int is not None) and (self.gen_no + 1) % tr_int == 0:
-                    self.mixture_model.update(np.array(self.sol))
+                    self.mixture_model.update(np.array(self.sol, dtype=self.dtype))
                     offspring_A = self.mixture_model.sample(pop_size)
                     for i in range(0, len(offspring_A)):
                         offspring_B = check_bounds(offspring_A[i].tolist())
@@ -68,46 +90,130 @@ class trNSGA2():
                 else: 
                     a1 = random.randint(0, pop_size - 1)
                     a2 = random.randint(0, pop_size - 1)
-                    a = binary_tournament(a1, a2, self.obj1[:], self.obj2[:])
+                    a = self.tournament(a1, a2, obj1, obj2, rank)
                     b1 = random.randint(0, pop_size - 1)
                     b2 = random.randint(0, pop_size - 1)
-                    b = binary_tournament(b1, b2, self.obj1[:], self.obj2[:])
+                    b = self.tournament(b1, b2, obj1, obj2, rank)
                     c1, c2 = SBX_crossover(self.sol[a], self.sol[b])
                     c1_mutated, c2_mutated = polynomial_mutation(c1, c2)
                     solution2.append(c1_mutated)
                     solution2.append(c2_mutated)
-            function1_values2 = self.obj1[:]
-            function2_values2 = self.obj2[:]
+            obj_values2 = self.obj[:]
             #evaluate offspring obj
             for i in range(pop_size, 2 * pop_size):    
-                obj = self.problem.evaluate(np.array(solution2[i]))
-                function1_values2.append(obj[0])
-                function2_values2.append(obj[1])
-                
-            non_dominated_sorted_solution2 = fast_non_dominated_sort(function1_values2[:], function2_values2[:])
-            crowding_distance_values2 = []
-            for i in range(0, len(non_dominated_sorted_solution2)):
-                crowding_distance_values2.append(crowding_distance(function1_values2[:], function2_values2[:], non_dominated_sorted_solution2[i][:]))
-    
+                obj_values2.append(self.evaluate(solution2[i]))
+
             # Environmental selection
-            new_solution = []
-            self.obj1, self.obj2 = [], []
-            for i in range(0, len(non_dominated_sorted_solution2)):
-                non_dominated_sorted_solution2[i].sort()
-                front = sort_distance(non_dominated_sorted_solution2[i], crowding_distance_values2[i])
-                front.reverse()
-                for index in front:
-                    new_solution.append(solution2[index])
-                    self.obj1.append(function1_values2[index])
-                    self.obj2.append(function2_values2[index])
-                    if (len(new_solution) == pop_size):
-                        break
-                if (len(new_solution) == pop_size):
-                    break
-    
-            self.sol = new_solution[:]
+            if self.selection == "reference":
+                idx = reference_direction_selection(obj_values2, pop_size, self.ref_dirs)
+                self.sol = [solution2[i] for i in idx]
+                self.obj = [obj_values2[i] for i in idx]
+            else:
+                self.environmental_selection(solution2, obj_values2, pop_size)
             self.gen_no += 1
             
-            curr_sol = np.array(self.sol)
+            curr_sol = np.array(self.sol, dtype=self.dtype)
             self.pop_mean.append(np.mean(curr_sol, axis=0))
-            self.pop_var.append(np.diag(np.cov(curr_sol.T)))
\ No newline at end of file
+            self.pop_var.append(np.diag(np.cov(curr_sol.T)))
+            if self.checkpoint is not None and self.gen_no % self.checkpoint_int == 0:
+                self.save_checkpoint(self.checkpoint)
+
+    #NSGA2 selection based on non-dominated sort & crowding distance (2 obj)
+    def environmental_selection(self, solution2, obj_values2, pop_size):
+        function1_values2 = [o[0] for o in obj_values2]
+        function2_values2 = [o[1] for o in obj_values2]
+        non_dominated_sorted_solution2 = fast_non_dominated_sort(function1_values2[:], function2_values2[:])
+        crowding_distance_values2 = []
+        for i in range(0, len(non_dominated_sorted_solution2)):
+            crowding_distance_values2.append(crowding_distance(function1_values2[:], function2_values2[:], non_dominated_sorted_solution2[i][:]))
+
+        new_solution = []
+        self.obj = []
+        for i in range(0, len(non_dominated_sorted_solution2)):
+            non_dominated_sorted_solution2[i].sort()
+            front = sort_distance(non_dominated_sorted_solution2[i], crowding_distance_values2[i])
+            front.reverse()
+            for index in front:
+                new_solution.append(solution2[index])
+                self.obj.append(obj_values2[index])
+                if (len(new_solution) == pop_size):
+                    break
+            if (len(new_solution) == pop_size):
+                break
+
+        self.sol = new_solution[:]
+
+    #dominance based tournament for 2 obj, non-dominated rank based for more obj
+    def tournament(self, index1, index2, obj1, obj2, rank):
+        if self.n_obj == 2: return binary_tournament(index1, index2, obj1, obj2)
+
+        return binary_tournament_rank(index1, index2, rank)
+
+    @property
+    def obj1(self):
+        return [o[0] for o in self.obj]
+
+    @property
+    def obj2(self):
+        return [o[1] for o in self.obj]
+
+    def evaluate(self, x):
+        F, G = self.problem.evaluate(np.array(x, dtype=self.dtype), return_values_of=["F", "G"])
+        obj = [float(v) for v in constraint_penalty(F, G)]
+        if self.archive is not None: self.archive.add(x, obj)
+
+        return obj
+
+    #key of the problem & of the solver settings a checkpoint is only valid for, max_gen may differ
+    def settings_key(self, pop_size, nVar, tr_int, seed):
+        problem_key = self.problem.key() if hasattr(self.problem, "key") else type(self.problem).__name__
+        mm = None if self.mixture_model is None else self.mixture_model.mTot
+        settings = (problem_key, pop_size, nVar, tr_int, seed, self.selection,
+                    None if self.ref_dirs is None else self.ref_dirs.shape, mm, self.archive is not None)
+
+        return hashlib.sha1(repr(settings).encode()).hexdigest()[:16]
+
+    #save population, obj, pop statistics, mixture model & rng states into a npz file
+    def save_checkpoint(self, path):
+        py_state = random.getstate()
+        np_state = np.random.get_state()
+        state = {"key": np.array(self.key), "gen_no": np.array(self.gen_no), "sol": np.array(self.sol, dtype=float),
+                 "obj": np.array(self.obj, dtype=float).reshape(-1, self.n_obj),
+                 "pop_mean": np.array(self.pop_mean), "pop_var": np.array(self.pop_var),
+                 "py_rng": np.array(py_state[1], dtype=np.uint64),
+                 "py_rng_gauss": np.array([] if py_state[2] is None else [py_state[2]]),
+                 "np_rng": np_state[1],
+                 "np_rng_pos": np.array([np_state[2], np_state[3]]), "np_rng_gauss": np.array(np_state[4])}
+        if self.mixture_model is not None:
+            for k, v in self.mixture_model.getState().items():
+                state["mm_" + k] = v
+        if self.archive is not None:
+            for k, v in self.archive.getState().items():
+                state["ar_" + k] = v
+
+        #write to a temp file first so that a preempted save does not corrupt the last checkpoint
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp, path)
+
+    def load_checkpoint(self, path, pop_size, nVar):
+        with np.load(path) as f:
+            state = {k: f[k] for k in f.files}
+        if "key" not in state or str(state["key"]) != self.key:
+            raise ValueError("checkpoint " + path + " was written for a different problem or solver settings")
+        if state["sol"].shape != (pop_size, nVar) or state["obj"].shape[1] != self.n_obj:
+            raise ValueError("checkpoint " + path + " does not match pop_size/ nVar of the run")
+
+        self.gen_no = int(state["gen_no"])
+        self.sol = state["sol"].tolist()
+        self.obj = state["obj"].tolist()
+        self.pop_mean, self.pop_var = list(state["pop_mean"]), list(state["pop_var"])
+        gauss = state["py_rng_gauss"]
+        random.setstate((3, tuple(int(v) for v in state["py_rng"]), float(gauss[0]) if gauss.size else None))
+        np.random.set_state(("MT19937", state["np_rng"], int(state["np_rng_pos"][0]),
+                             int(state["np_rng_pos"][1]), float(state["np_rng_gauss"])))
+        if self.mixture_model is not None:
+            self.mixture_model.setState({k[3:]: v for k, v in state.items() if k.startswith("mm_")})
+        if self.archive is not None:
+            self.archive.setState({k[3:]: v for k, v in state.items() if k.startswith("ar_")})
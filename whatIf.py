@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Low-latency what-if evaluation of a few allocation plans from the live factory state
+- WhatIfEvaluator, pre-draws the demand & allocation scenarios of R replications over a short horizon T once,
+  then scores a batch of plans starting from a snapshot of the factories instead of empty queues
+
+Factory state (one dict per factory, same format as Factory.snapshot/ AllocProblem.snapshot):
+- activeOrder: list of (cust, arrivalTime, remaining reqHr), arrivalTime relative to today (t = 0), e.g. -3
+- unUtilHr, totAvailHr: unutilised & available production hr counters accumulated so far
+  the unUtilHr & loadImbalance obj only count the hr accumulated over the what-if horizon (see Factory.horizonHr)
+@author: cstan
+"""
+
+import time
+import numpy as np
+
+import model as mop
+
+class WhatIfEvaluator():
+    def __init__(self, problem, R=10, T=5, seed=0):
+        self.problem = problem
+        self.R, self.T = R, T
+
+        #precompiled scenario draws, demand (R by nP by nC by T) & allocation uniforms (R by T by nC)
+        rng = np.random.RandomState(seed)
+        p = problem.p
+        mu = np.asarray(p["aveD"], dtype=float)[:, :, None]
+        sigma = mu * np.asarray(p["devD"], dtype=float)[:, :, None]
+        demand = mu + sigma * rng.standard_normal((R, p["nP"], p["nC"], T))
+        demand[demand < 0] = 0  # convert negative value to zero
+        self.demand = np.rint(demand).astype(problem.idt)
+        self.rand = rng.rand(R, T, p["nC"]).astype(problem.fdt, copy=False)
+
+    #score plans X (n by nVar) from state (list of factory state), returns the obj values (n by n_obj)
+    #& the num of replications used, replications stop early once the next one would exceed budget (sec)
+    def evaluate(self, state, X, budget=None):
+        start = time.perf_counter()
+        X = np.atleast_2d(X)
+        plans = [self.problem.decode(x) for x in X]
+        F = np.zeros((X.shape[0], self.problem.n_obj))
+        #one sketch per plan merged over the replications, percentiles are computed once as in experiment
+        sketch = [self.problem.newSketch() for _ in plans]
+
+        r = 0
+        while r < self.R:
+            for i, (alloc, minPHr) in enumerate(plans):
+                for f, s in zip(self.problem.factory, state): f.restore(s)
+                completedOrder = self.problem.simPlan(self.demand[r], alloc, minPHr, self.T, self.rand[r], sketch[i])
+                F[i] += self.problem.computeObj(completedOrder, self.T)
+            r += 1
+            #stop if another replication is not expected to finish within the budget
+            elapsed = time.perf_counter() - start
+            if budget is not None and elapsed * (r + 1) / r > budget: break
+
+        F /= r
+        for j, o in enumerate(self.problem.objectives):
+            if o in mop.QUANTILE_OBJECTIVES:
+                F[:, j] = [self.problem.computeQuantileObj(o, sk) for sk in sketch]
+
+        return F, r